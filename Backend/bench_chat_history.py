@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Chat history pagination benchmark for SDMIT Nexus
+Seeds chat groups of growing size and times the first page, a deep page
+and the last page of /groups/messages' keyset query. Latency should stay
+flat as a group grows to 100k messages.
+"""
+
+import sys
+import os
+import time
+import statistics
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from db import engine, SessionLocal
+import models
+from models import Group, Student, DoubtClarification
+from utils.chat_cache import recent_page
+
+GROUP_SIZES = [1_000, 10_000, 100_000]
+PAGE_SIZE = 50
+RUNS = 50
+
+
+def seed_group(db, size: int) -> int:
+    group = Group(branch="BENCH", year=str(size), group_name=f"BENCH-{size}")
+    db.add(group)
+    db.commit()
+    student = Student(
+        name=f"Bench Student {size}",
+        usn=f"BENCH{size}",
+        email=f"bench{size}@sdmit.in",
+        password_hash="-",
+        branch="BENCH",
+        year=str(size),
+        group_id=group.group_id
+    )
+    db.add(student)
+    db.commit()
+    # Set-based seeding, one second apart so pages span real time ranges
+    db.execute(text("""
+        INSERT INTO doubt_clarification (group_id, sender_id, sender_role, message, is_reply, created_at)
+        SELECT :group_id, :sender_id, 'student', 'benchmark message ' || n, false,
+               now() - make_interval(secs => :size - n)
+        FROM generate_series(1, :size) AS n
+    """), {"group_id": group.group_id, "sender_id": student.student_id, "size": size})
+    db.commit()
+    return group.group_id
+
+
+def cleanup(db, group_ids):
+    db.query(DoubtClarification).filter(DoubtClarification.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Student).filter(Student.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Group).filter(Group.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def time_page(db, group_id: int, before=None) -> float:
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        recent_page(db, group_id, PAGE_SIZE + 1, before)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark():
+    print("Chat history pagination benchmark")
+    print("=" * 64)
+    models.Base.metadata.create_all(bind=engine)
+    for index in DoubtClarification.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    group_ids = []
+    try:
+        for size in GROUP_SIZES:
+            group_ids.append(seed_group(db, size))
+        db.execute(text("ANALYZE doubt_clarification"))
+        db.commit()
+
+        print(f"{'messages':>10} {'first page':>12} {'middle page':>12} {'last page':>12}   (median ms)")
+        for size, group_id in zip(GROUP_SIZES, group_ids):
+            middle = db.query(DoubtClarification.created_at, DoubtClarification.doubt_id).filter(
+                DoubtClarification.group_id == group_id
+            ).order_by(DoubtClarification.created_at, DoubtClarification.doubt_id).offset(size // 2).first()
+            oldest = db.query(DoubtClarification.created_at, DoubtClarification.doubt_id).filter(
+                DoubtClarification.group_id == group_id
+            ).order_by(DoubtClarification.created_at, DoubtClarification.doubt_id).offset(PAGE_SIZE).first()
+
+            first_ms = time_page(db, group_id)
+            middle_ms = time_page(db, group_id, tuple(middle))
+            last_ms = time_page(db, group_id, tuple(oldest))
+            print(f"{size:>10} {first_ms:>12.2f} {middle_ms:>12.2f} {last_ms:>12.2f}")
+    finally:
+        cleanup(db, group_ids)
+        db.close()
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Notification fan-out load benchmark for SDMIT Nexus
+Seeds students across groups, points the mail path at a local SMTP sink
+and drives the material, document and deadline-reminder notifications end
+to end: outbox insert, dispatcher, mail scheduler, SMTP pool. Reports
+messages and recipients per second, enqueue-to-delivery lag and how long
+the event loop was blocked, so changes to the mail path can be compared.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, text
+from db import engine, SessionLocal
+import models
+from models import (
+    Group, Student, Lecturer, Document, Notification,
+    NotificationStatus, NotificationType
+)
+from smtp_sink import SMTPSink
+from utils import smtp_pool, notification_outbox
+from utils.mail_scheduler import mail_scheduler, TokenBucket
+from utils.email_notifications import email_service
+from utils.notification_outbox import enqueue_group, notification_dispatcher
+from utils.deadline_reminders import save_reminders
+
+BRANCH = "NBENCH"
+TIMEOUT = 300   # seconds to wait for one scenario to drain
+
+
+# -----------------------------
+# Seeding
+# -----------------------------
+def seed(db, students: int, groups: int):
+    lecturer = Lecturer(name="Bench Lecturer", email="nbench-lecturer@sdmit.in", password_hash="-")
+    db.add(lecturer)
+    group_rows = [Group(branch=BRANCH, year=str(i), group_name=f"{BRANCH}-{i}") for i in range(groups)]
+    db.add_all(group_rows)
+    db.commit()
+    group_ids = [g.group_id for g in group_rows]
+    # Set-based seeding, students spread evenly over the groups
+    db.execute(text("""
+        INSERT INTO students (name, usn, email, password_hash, branch, year, group_id)
+        SELECT 'Bench Student ' || n, 'NBENCH' || n, 'nbench-' || g.group_id || '-' || n || '@sdmit.in',
+               '-', :branch, g.year, g.group_id
+        FROM generate_series(0, :students - 1) AS n
+        JOIN groups g ON g.group_id = (:group_ids)[n % :groups + 1]
+    """), {"students": students, "groups": groups, "group_ids": group_ids, "branch": BRANCH})
+    db.commit()
+    return lecturer.lecturer_id, group_ids
+
+
+def cleanup(db, lecturer_id, group_ids):
+    db.query(Notification).filter(Notification.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Document).filter(Document.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Student).filter(Student.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Group).filter(Group.group_id.in_(group_ids)).delete(synchronize_session=False)
+    db.query(Lecturer).filter(Lecturer.lecturer_id == lecturer_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def create_documents(lecturer_id, group_ids, deadline):
+    db = SessionLocal()
+    try:
+        documents = [
+            Document(group_id=gid, uploaded_by=lecturer_id, title=f"Bench form {gid}",
+                     file_path="uploads/bench.pdf", file_name="bench.pdf", deadline=deadline)
+            for gid in group_ids
+        ]
+        db.add_all(documents)
+        db.commit()
+        return [d.document_id for d in documents]
+    finally:
+        db.close()
+
+
+def sign_half(document_ids):
+    """Every other student signs, so reminders exercise the unsigned anti-join"""
+    db = SessionLocal()
+    try:
+        db.execute(text("""
+            INSERT INTO document_signatures (document_id, student_id)
+            SELECT d.document_id, s.student_id
+            FROM documents d JOIN students s ON s.group_id = d.group_id
+            WHERE d.document_id = ANY(:document_ids) AND s.student_id % 2 = 0
+        """), {"document_ids": document_ids})
+        db.commit()
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Scenarios. Each returns {group_id: enqueue time} for the lag report.
+# -----------------------------
+def upload(group_ids, type: NotificationType, message, title: str):
+    enqueued = {}
+    for gid in group_ids:
+        db = SessionLocal()
+        try:
+            subject, content = message("Bench Lecturer", title)
+            enqueue_group(db, gid, type, subject, content, item_title=f"{title} by Bench Lecturer")
+            db.commit()
+            enqueued[gid] = time.time()
+        finally:
+            db.close()
+        notification_dispatcher.wake()
+    return enqueued
+
+
+async def material_scenario(lecturer_id, group_ids):
+    return await run_in_threadpool(
+        upload, group_ids, NotificationType.material_update, email_service.material_message, "Bench notes"
+    )
+
+
+async def document_scenario(lecturer_id, group_ids):
+    await run_in_threadpool(create_documents, lecturer_id, group_ids, datetime.now() + timedelta(days=2))
+    return await run_in_threadpool(
+        upload, group_ids, NotificationType.document_update, email_service.document_message, "Bench form"
+    )
+
+
+async def deadline_scenario(lecturer_id, group_ids):
+    now = datetime.now()
+    document_ids = await run_in_threadpool(create_documents, lecturer_id, group_ids, now + timedelta(minutes=30))
+    await run_in_threadpool(sign_half, document_ids)
+    for document_id in document_ids:
+        await run_in_threadpool(save_reminders, document_id, {60: now - timedelta(seconds=1)})
+    start = time.time()
+    await email_service.process_due_reminders()
+    return {gid: start for gid in group_ids}
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+class LoopMonitor:
+    """Sleeps in short ticks and records how late each wake-up was"""
+
+    def __init__(self, tick: float = 0.01, threshold: float = 0.005):
+        self.tick = tick
+        self.threshold = threshold
+        self.stalls = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.tick)
+            late = time.perf_counter() - start - self.tick
+            if late > self.threshold:
+                self.stalls.append(late)
+
+    def start(self):
+        self.stalls = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def pending(group_ids) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.count()).filter(
+            Notification.group_id.in_(group_ids),
+            Notification.status == NotificationStatus.pending
+        ).scalar()
+    finally:
+        db.close()
+
+
+def failed(group_ids) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.count()).filter(
+            Notification.group_id.in_(group_ids),
+            Notification.status == NotificationStatus.failed
+        ).scalar()
+    finally:
+        db.close()
+
+
+def group_of(recipient: str) -> int:
+    # <nbench-{group_id}-{n}@sdmit.in>
+    return int(recipient.strip("<>").split("-")[1])
+
+
+async def run_scenario(label, scenario, sink, lecturer_id, group_ids):
+    first_message = len(sink.messages)
+    failed_before = await run_in_threadpool(failed, group_ids)
+    monitor = LoopMonitor()
+    monitor.start()
+    start = time.time()
+    enqueued = await scenario(lecturer_id, group_ids)
+    while await run_in_threadpool(pending, group_ids):
+        if time.time() - start > TIMEOUT:
+            print(f"{label}: gave up after {TIMEOUT}s with mail still pending")
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.time() - start
+    await monitor.stop()
+
+    messages = sink.messages[first_message:]
+    lags = sorted(
+        received_at - enqueued[group_of(rcpt)]
+        for received_at, _, recipients, _ in messages
+        for rcpt in recipients
+    )
+    recipients = len(lags)
+    rejected = await run_in_threadpool(failed, group_ids) - failed_before
+    print(f"{label:<18} {len(messages):>8} {recipients:>10} {rejected:>7} "
+          f"{len(messages) / elapsed:>9.1f} {recipients / elapsed:>9.1f} "
+          f"{statistics.median(lags) if lags else 0:>8.2f} {lags[int(len(lags) * 0.95)] if lags else 0:>8.2f} "
+          f"{max(monitor.stalls, default=0) * 1000:>9.1f} {sum(monitor.stalls) * 1000:>9.1f}")
+
+
+async def run_benchmark(args):
+    print(f"Notification fan-out benchmark: {args.students} students in {args.groups} groups, "
+          f"{args.latency * 1000:.0f} ms per reply, {args.connect_latency * 1000:.0f} ms connect, "
+          f"{args.failure_rate:.0%} rejected")
+    print("=" * 106)
+    models.Base.metadata.create_all(bind=engine)
+
+    # Measure the mail path itself: no provider quota, no digest wait
+    mail_scheduler.per_second = TokenBucket(1_000_000, 1_000_000)
+    mail_scheduler.daily = TokenBucket(1_000_000, 1_000_000)
+    notification_outbox.DIGEST_WINDOW_SECONDS = 0
+
+    db = SessionLocal()
+    lecturer_id, group_ids = seed(db, args.students, args.groups)
+    try:
+        with SMTPSink(latency=args.latency, connect_latency=args.connect_latency,
+                      failure_rate=args.failure_rate, seed=1) as sink:
+            smtp_pool.SMTP_SERVER, smtp_pool.SMTP_PORT, smtp_pool.SMTP_USE_TLS = "127.0.0.1", sink.port, False
+            notification_dispatcher.start()
+
+            print(f"{'scenario':<18} {'messages':>8} {'recipients':>10} {'failed':>7} "
+                  f"{'msg/s':>9} {'rcpt/s':>9} {'lag p50':>8} {'lag p95':>8} {'max stall':>9} {'stalled':>9}")
+            print(f"{'':<18} {'':>8} {'':>10} {'':>7} {'':>9} {'':>9} {'(s)':>8} {'(s)':>8} {'(ms)':>9} {'(ms)':>9}")
+            await run_scenario("material upload", material_scenario, sink, lecturer_id, group_ids)
+            await run_scenario("document upload", document_scenario, sink, lecturer_id, group_ids)
+            await run_scenario("deadline reminder", deadline_scenario, sink, lecturer_id, group_ids)
+
+            await notification_dispatcher.stop()
+            smtp_pool.close_all_pools()
+            print("=" * 106)
+            print(f"Sink saw {sink.stats['connections']} connections, {sink.stats['messages']} messages, "
+                  f"{sink.stats['recipients']} recipients, {sink.stats['rejected']} rejected")
+    finally:
+        cleanup(db, lecturer_id, group_ids)
+        db.close()
+        email_service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark notification fan-out against a local SMTP sink")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds added to every SMTP reply")
+    parser.add_argument("--connect-latency", type=float, default=0.05, help="seconds before the SMTP greeting")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of recipients rejected with 550")
+    asyncio.run(run_benchmark(parser.parse_args()))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+SMTP connection pool benchmark for SDMIT Nexus
+Sends the same batch of emails through a local SMTP sink twice: once with
+a new connection + login per message (the old behaviour) and once through
+the shared SMTP pool, and prints messages per second for each.
+"""
+
+import sys
+import os
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import SMTPSink
+from utils import smtp_pool
+
+MESSAGES = 200
+LATENCY = 0.002          # per SMTP reply
+CONNECT_LATENCY = 0.05   # stands in for TCP + STARTTLS setup to a remote provider
+USERNAME = "bench@sdmit.in"
+PASSWORD = "bench"
+
+
+def build_message(i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "SDMIT Nexus pool benchmark"
+    msg["From"] = USERNAME
+    msg["To"] = f"student{i}@sdmit.in"
+    msg.set_content("Benchmark message")
+    return msg
+
+
+def send_per_connection(port: int, i: int):
+    server = smtplib.SMTP("127.0.0.1", port, timeout=15)
+    server.ehlo()
+    server.login(USERNAME, PASSWORD)
+    server.send_message(build_message(i))
+    server.quit()
+
+
+def run(label: str, fn, workers: int = 1):
+    start = time.perf_counter()
+    if workers == 1:
+        for i in range(MESSAGES):
+            fn(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(fn, range(MESSAGES)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {MESSAGES / elapsed:>10.1f} msg/s")
+
+
+def run_benchmark():
+    print(f"SMTP pool benchmark: {MESSAGES} messages, {CONNECT_LATENCY * 1000:.0f} ms connect, "
+          f"{LATENCY * 1000:.0f} ms per reply")
+    print("=" * 56)
+    with SMTPSink(latency=LATENCY, connect_latency=CONNECT_LATENCY) as sink:
+        run("new connection per message", lambda i: send_per_connection(sink.port, i))
+
+        pool = smtp_pool.SMTPConnectionPool(USERNAME, PASSWORD, host="127.0.0.1", port=sink.port, use_tls=False)
+        run("pooled, 1 thread", lambda i: pool.send_message(build_message(i)))
+        run(f"pooled, {pool.max_connections} threads", lambda i: pool.send_message(build_message(i)),
+            workers=pool.max_connections)
+        pool.close_all()
+
+        print("=" * 56)
+        print(f"Sink saw {sink.stats['connections']} connections, {sink.stats['logins']} logins, "
+              f"{sink.stats['messages']} messages")
+
+
+if __name__ == "__main__":
+    run_benchmark()
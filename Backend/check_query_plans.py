@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Query plan check for SDMIT Nexus
+Seeds a realistically large college (students, chat history, documents,
+signatures, notifications) and runs EXPLAIN on every hot query. Fails if
+any of them plans a sequential scan over one of the big tables, which
+means an index is missing or no longer matches the query.
+
+Run it against a scratch database that is migrated to head:
+    alembic upgrade head && python check_query_plans.py
+"""
+
+import sys
+import os
+import argparse
+import json
+from datetime import datetime
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import and_, exists, func, select, text, tuple_
+from db import SessionLocal, engine
+from models import (
+    Group, Student, Lecturer, StudyMaterial, Event, DoubtClarification, Document, DocumentSignature,
+    Notification, NotificationChannel, NotificationStatus, RecipientRole
+)
+
+BRANCH = "PLANCHECK"
+# groups stays small (one row per branch and year), a seq scan there is the right plan
+LARGE_TABLES = {
+    "students", "study_materials", "events", "doubt_clarification", "documents",
+    "document_signatures", "notifications",
+}
+
+
+# -----------------------------
+# Seeding
+# -----------------------------
+def seed(db, groups: int, students_per_group: int, documents_per_group: int, messages_per_group: int):
+    lecturer = Lecturer(name="Plan Lecturer", email="plancheck-lecturer@sdmit.in", password_hash="-")
+    db.add(lecturer)
+    db.flush()
+    params = {
+        "branch": BRANCH, "groups": groups, "students": students_per_group, "documents": documents_per_group,
+        "messages": messages_per_group, "lecturer_id": lecturer.lecturer_id,
+    }
+    statements = [
+        """INSERT INTO groups (branch, year, group_name)
+           SELECT :branch, g::text, :branch || '-' || g FROM generate_series(1, :groups) g""",
+        """INSERT INTO students (name, usn, email, password_hash, branch, year, group_id)
+           SELECT 'Plan Student ' || g.group_id || '-' || n, 'PLAN' || g.group_id || '-' || n,
+                  'plancheck-' || g.group_id || '-' || n || '@sdmit.in', '-', :branch, g.year, g.group_id
+           FROM groups g CROSS JOIN generate_series(1, :students) n WHERE g.branch = :branch""",
+        """INSERT INTO study_materials (group_id, uploaded_by, title, content, file_url)
+           SELECT g.group_id, :lecturer_id, 'Notes ' || n, '-', 'uploads/x.pdf'
+           FROM groups g CROSS JOIN generate_series(1, :documents) n WHERE g.branch = :branch""",
+        """INSERT INTO events (group_id, created_by, title, content)
+           SELECT g.group_id, :lecturer_id, 'Event ' || n, '-'
+           FROM groups g CROSS JOIN generate_series(1, :documents) n WHERE g.branch = :branch""",
+        """INSERT INTO documents (group_id, uploaded_by, title, file_path, file_name, deadline)
+           SELECT g.group_id, :lecturer_id, 'Form ' || n, 'uploads/x.pdf', 'x.pdf', now() + n * interval '1 day'
+           FROM groups g CROSS JOIN generate_series(1, :documents) n WHERE g.branch = :branch""",
+        # Every other student has signed every document
+        """INSERT INTO document_signatures (document_id, student_id)
+           SELECT d.document_id, s.student_id
+           FROM documents d JOIN groups g ON g.group_id = d.group_id
+           JOIN students s ON s.group_id = d.group_id
+           WHERE g.branch = :branch AND s.student_id % 2 = 0""",
+        """INSERT INTO doubt_clarification (group_id, sender_id, sender_role, message, is_reply, created_at)
+           SELECT g.group_id, n, 'student', 'Question ' || n, false, now() - n * interval '1 minute'
+           FROM groups g CROSS JOIN generate_series(1, :messages) n WHERE g.branch = :branch""",
+        # Five delivered notifications per student, plus a small pending backlog
+        """INSERT INTO notifications (recipient_id, recipient_role, message, type, channel, status, group_id,
+                                      subject, sent_at, next_attempt_at)
+           SELECT s.student_id, 'student', '-', 'material_update', 'both', 'sent', s.group_id, 'Notes', now(), now()
+           FROM students s CROSS JOIN generate_series(1, 5) WHERE s.branch = :branch""",
+        """INSERT INTO notifications (recipient_id, recipient_role, message, type, channel, status, group_id,
+                                      subject, next_attempt_at)
+           SELECT s.student_id, 'student', '-', 'material_update', 'email', 'pending', s.group_id, 'Notes', now()
+           FROM students s WHERE s.branch = :branch AND s.student_id % 50 = 0""",
+    ]
+    for statement in statements:
+        db.execute(text(statement), params)
+    db.commit()
+    for table in sorted(LARGE_TABLES | {"groups"}):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+    return lecturer.lecturer_id
+
+
+def cleanup(db, lecturer_id):
+    group_ids = select(Group.group_id).where(Group.branch == BRANCH).scalar_subquery()
+    db.query(Notification).filter(Notification.group_id.in_(group_ids)).delete(synchronize_session=False)
+    # Deleting the groups and the lecturer cascades to everything else seeded
+    db.query(Group).filter(Group.branch == BRANCH).delete(synchronize_session=False)
+    db.query(Lecturer).filter(Lecturer.lecturer_id == lecturer_id).delete(synchronize_session=False)
+    db.commit()
+
+
+# -----------------------------
+# Hot queries, as the routes and workers issue them
+# -----------------------------
+def hot_queries(db):
+    group_id, year = db.query(Group.group_id, Group.year).filter(Group.branch == BRANCH).order_by(Group.group_id).first()
+    student_id = db.query(func.min(Student.student_id)).filter(Student.group_id == group_id).scalar()
+    document_ids = [d for d, in db.query(Document.document_id).filter(Document.group_id == group_id).limit(10)]
+    middle_doubt = db.query(func.min(DoubtClarification.doubt_id)).filter(
+        DoubtClarification.group_id == group_id).scalar()
+    now = datetime.now()
+
+    return {
+        "group by branch/year": select(Group).where(Group.branch == BRANCH, Group.year == year),
+        "group roster (fan-out)": select(Student.student_id, Student.email).where(Student.group_id == group_id),
+        "chat history page": (
+            select(DoubtClarification)
+            .where(DoubtClarification.group_id == group_id,
+                   tuple_(DoubtClarification.created_at, DoubtClarification.doubt_id) < (now, 2 ** 31 - 1))
+            .order_by(DoubtClarification.created_at.desc(), DoubtClarification.doubt_id.desc())
+            .limit(50)
+        ),
+        # Reply trees (delete_thread) and the FK cascade when a message is deleted
+        "message replies": select(DoubtClarification.doubt_id).where(
+            DoubtClarification.parent_doubt_id == middle_doubt),
+        "chat unread count": select(func.count()).where(
+            DoubtClarification.group_id == group_id, DoubtClarification.doubt_id > middle_doubt),
+        "group materials": (
+            select(StudyMaterial).where(StudyMaterial.group_id == group_id).order_by(StudyMaterial.material_id.desc())
+        ),
+        "group events": select(Event).where(Event.group_id == group_id).order_by(Event.event_id.desc()),
+        "group documents": (
+            select(Document).where(Document.group_id == group_id).order_by(Document.deadline, Document.document_id)
+        ),
+        "document signatures": select(DocumentSignature).where(DocumentSignature.document_id.in_(document_ids)),
+        # FK cascade when a student is deleted
+        "signatures by student": select(DocumentSignature.signature_id).where(
+            DocumentSignature.student_id == student_id),
+        "unsigned students (reminders)": select(Student.student_id).where(
+            Student.group_id == group_id,
+            ~exists().where(DocumentSignature.document_id == document_ids[0],
+                            DocumentSignature.student_id == Student.student_id)
+        ),
+        "student document status": (
+            select(Document.document_id, DocumentSignature.signature_id)
+            .select_from(Student)
+            .join(Document, Document.group_id == Student.group_id)
+            .outerjoin(DocumentSignature, and_(DocumentSignature.document_id == Document.document_id,
+                                               DocumentSignature.student_id == Student.student_id))
+            .where(Student.student_id == student_id, DocumentSignature.signature_id.is_(None))
+            .order_by(Document.deadline, Document.document_id)
+            .limit(21)
+        ),
+        # FK cascade when a chat message is deleted
+        "notifications by thread": select(Notification.notification_id).where(
+            Notification.thread_id == middle_doubt),
+        "inbox page": (
+            select(Notification)
+            .where(Notification.recipient_id == student_id, Notification.recipient_role == RecipientRole.student)
+            .order_by(Notification.notification_id.desc())
+            .limit(20)
+        ),
+        "inbox unread count": select(func.count()).where(
+            Notification.recipient_id == student_id, Notification.recipient_role == RecipientRole.student,
+            Notification.read_at.is_(None), Notification.channel != NotificationChannel.email
+        ),
+        "outbox claim": (
+            select(Notification.notification_id)
+            .where(Notification.status == NotificationStatus.pending, Notification.next_attempt_at <= now)
+            .order_by(Notification.next_attempt_at)
+            .limit(100)
+        ),
+        "open digest window": select(Notification.notification_id).where(
+            Notification.status == NotificationStatus.pending, Notification.group_id == group_id
+        ).limit(1),
+    }
+
+
+def seq_scans(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(db, statement) -> dict:
+    sql = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    row = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = row if isinstance(row, list) else json.loads(row)
+    return plan[0]["Plan"]
+
+
+def check(db) -> bool:
+    ok = True
+    print(f"{'query':<32} {'cost':>10}  plan")
+    print("-" * 90)
+    for label, statement in hot_queries(db).items():
+        plan = explain(db, statement)
+        scans = seq_scans(plan)
+        ok = ok and not scans
+        status = f"SEQ SCAN on {', '.join(scans)}" if scans else plan["Node Type"]
+        print(f"{label:<32} {plan['Total Cost']:>10.1f}  {status}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a hot query plans a sequential scan on seeded data")
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--students", type=int, default=100, help="students per group")
+    parser.add_argument("--documents", type=int, default=20, help="documents, materials and events per group")
+    parser.add_argument("--messages", type=int, default=500, help="chat messages per group")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    lecturer_id = seed(db, args.groups, args.students, args.documents, args.messages)
+    try:
+        passed = check(db)
+    finally:
+        cleanup(db, lecturer_id)
+        db.close()
+    print("-" * 90)
+    print("All hot queries use indexes" if passed else "Sequential scans found, see above")
+    sys.exit(0 if passed else 1)
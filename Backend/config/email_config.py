@@ -61,6 +61,21 @@ Deadline: {deadline}
 
 Please log in to SDMIT Nexus to sign the document immediately.
 
+Best regards,
+SDMIT Nexus Team
+        """
+    },
+    "digest_notification": {
+        "subject": "{count} new {label} in your group - SDMIT Nexus",
+        "template": """
+Dear Student,
+
+The following {label} were posted in your group:
+
+{items}
+
+Please log in to SDMIT Nexus to view them.
+
 Best regards,
 SDMIT Nexus Team
         """
@@ -72,6 +87,21 @@ Dear User,
 
 {replier_name} has replied to your message. Please check it in the Group Discussion section.
 
+Best regards,
+SDMIT Nexus Team
+        """
+    },
+    "reply_digest_notification": {
+        "subject": "{count} new replies to your message in Group Discussion",
+        "template": """
+Dear User,
+
+Your message in the Group Discussion has new replies:
+
+{items}
+
+Please check them in the Group Discussion section.
+
 Best regards,
 SDMIT Nexus Team
         """
@@ -82,6 +112,40 @@ SDMIT Nexus Team
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 SMTP_TIMEOUT = 15
+SMTP_USE_TLS = True
+
+# SMTP Connection Pool
+SMTP_POOL_SIZE = 4                   # Max open connections per sending account
+SMTP_POOL_MAX_IDLE = 60              # Seconds an idle connection is kept before closing
+SMTP_POOL_HEALTHCHECK_AFTER = 5      # Seconds idle before a connection is NOOP-checked on reuse
+SMTP_MAX_MESSAGES_PER_CONNECTION = 90  # Recycle before Gmail's ~100 messages per session
 
 # Notification Settings
 DEADLINE_REMINDER_MINUTES = 10  # Minutes before deadline to send reminder
+DEADLINE_REMINDER_STAGES = [24 * 60, 60, DEADLINE_REMINDER_MINUTES]  # Every reminder stage, in minutes before the deadline
+
+# Notification Outbox
+OUTBOX_WORKERS = 2              # Dispatcher workers per process
+OUTBOX_BATCH_SIZE = 50          # Rows claimed per worker per round
+OUTBOX_POLL_INTERVAL = 2        # Seconds an idle worker waits before polling again
+OUTBOX_LEASE_SECONDS = 300      # A claimed row becomes claimable again if its worker dies
+OUTBOX_MAX_ATTEMPTS = 5         # Attempts before a row is marked failed
+OUTBOX_RETRY_BASE_SECONDS = 30  # Retry delay doubles after each failed attempt
+DIGEST_WINDOW_SECONDS = 120     # Uploads of one type to one group within this window share a digest email
+DIGEST_MAX_ITEMS = 10           # A digest is sent early once it lists this many uploads
+REPLY_DIGEST_WINDOW_SECONDS = 300  # Replies to one message within this window reach its author as one email
+BULK_SEND_ENABLED = True        # Send identical notifications as one message per chunk of BCC recipients
+BULK_BCC_CHUNK_SIZE = 50        # Envelope recipients per SMTP transaction (Gmail allows up to 100)
+
+# Mail Scheduler (rate limits count recipients, matching Gmail's sending limits)
+MAIL_RATE_PER_SECOND = 10       # Sustained recipients per second
+MAIL_BURST = 100                # Recipients that may go out at once after a quiet period
+MAIL_DAILY_QUOTA = 2000         # Recipients per rolling day (Google Workspace limit)
+MAIL_URGENT_RESERVE = 100       # Part of the daily quota only OTP/password and deadline mail may use
+MAIL_MAX_QUEUE_WAIT = 120       # Seconds a non-urgent email may wait for quota before it is handed back
+
+# Scheduler Leader Election (one uvicorn worker runs reminder and maintenance jobs)
+LEADER_LOCK_KEY = 7261001       # PostgreSQL advisory lock key held by the leader
+LEADER_POLL_INTERVAL = 2        # Seconds between lock attempts, health checks and NOTIFY polls
+MAINTENANCE_INTERVAL_MINUTES = 15  # How often the leader re-syncs reminder timers and prunes the outbox
+OUTBOX_RETENTION_DAYS = 30      # Sent and failed outbox rows older than this are deleted
@@ -1,11 +1,16 @@
-from fastapi import FastAPI
-from db import Base, engine
-import models
-from routes import admin, auth, chats, face_reg, login,students_groups_get, lecturer, lect_groups_get,post_files,post_del_documents,sign,sse
+from fastapi import FastAPI, Request
+from db import async_engine
+from routes import admin, auth, chats, face_reg, login,students_groups_get, lecturer, lect_groups_get,post_files,post_del_documents,sign,sse,read_markers,notifications
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from fastapi.staticfiles import StaticFiles
 from utils.email_notifications import email_service
+from utils.smtp_pool import close_all_pools
+from utils.notification_outbox import notification_dispatcher
+from utils.leader_election import leader_elector
+from utils.query_metrics import query_metrics, QUERY_DEBUG
+from utils.pg_listener import pg_listener
+from utils.chat_cache import recent_messages, CHAT_CHANNEL
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,9 +23,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Query-Count", "X-Query-Time-Ms", "X-Query-Warning"],
 )
 
-models.Base.metadata.create_all(bind=engine)
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    """Per-request query counters; in debug mode they are also returned as headers"""
+    queries = query_metrics.begin_request()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    problems = query_metrics.end_request(f"{request.method} {route.path if route else 'unmatched'}", queries)
+    if QUERY_DEBUG:
+        response.headers["X-Query-Count"] = str(queries.count)
+        response.headers["X-Query-Time-Ms"] = f"{queries.seconds * 1000:.1f}"
+        if problems:
+            response.headers["X-Query-Warning"] = "; ".join(problems)[:500]
+    return response
+
+# Schema changes are applied with Alembic (alembic upgrade head), see migrations/
 app.mount("/static", StaticFiles(directory="uploads"), name="static")
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(chats.router, prefix="/chats", tags=["Chats"])
@@ -34,16 +55,29 @@ app.include_router(post_files.router, prefix="/files", tags=["files"])
 app.include_router(post_del_documents.router, prefix="/documents", tags=["documents"])
 app.include_router(sign.router, prefix="/sign-document", tags=["sign"])
 app.include_router(sse.router,prefix="/sse",tags=["sse"])
+app.include_router(read_markers.router, prefix="/read-markers", tags=["read_markers"])
+app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize email service scheduler on startup"""
+    """Start the outbox dispatcher and email scheduler; the elected leader worker restores reminders"""
+    # Chat history is cached per worker; drop a group's copy when another worker changes it
+    pg_listener.listen(CHAT_CHANNEL, recent_messages.on_notify)
+    pg_listener.on_reconnect = recent_messages.invalidate
+    pg_listener.start()
+    notification_dispatcher.start()
+    await email_service.start()
     logger.info("Email notification service initialized")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Shutdown email service scheduler on shutdown"""
-    email_service.scheduler.shutdown()
+    """Hand over leadership, then stop the outbox dispatcher, schedulers and SMTP sessions and database pools on shutdown"""
+    await leader_elector.stop()
+    await pg_listener.stop()
+    await notification_dispatcher.stop()
+    email_service.shutdown()
+    close_all_pools()
+    await async_engine.dispose()
     logger.info("Email notification service shutdown")
 
 if __name__ == "__main__":
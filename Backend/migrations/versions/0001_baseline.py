@@ -0,0 +1,208 @@
+"""Baseline: the schema main.py used to build with Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Every statement is IF NOT EXISTS, so a database that was created by the
+old create_all() call can be upgraded in place without stamping it first.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+recipient_role = postgresql.ENUM("student", "lecturer", "admin", name="recipientrole", create_type=False)
+notification_type = postgresql.ENUM(
+    "document_reminder", "event_update", "doubt_reply", name="notificationtype", create_type=False
+)
+notification_channel = postgresql.ENUM("in_app", "email", "both", name="notificationchannel", create_type=False)
+notification_status = postgresql.ENUM("sent", "pending", "failed", name="notificationstatus", create_type=False)
+
+ENUMS = (recipient_role, notification_type, notification_channel, notification_status)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.create(bind, checkfirst=True)
+
+    op.create_table(
+        "groups",
+        sa.Column("group_id", sa.Integer(), primary_key=True),
+        sa.Column("branch", sa.String(), nullable=False),
+        sa.Column("year", sa.String(), nullable=False),
+        sa.Column("group_name", sa.String(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_groups_group_id", "groups", ["group_id"], if_not_exists=True)
+
+    op.create_table(
+        "lecturers",
+        sa.Column("lecturer_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_lecturers_lecturer_id", "lecturers", ["lecturer_id"], if_not_exists=True)
+    op.create_index("ix_lecturers_email", "lecturers", ["email"], unique=True, if_not_exists=True)
+
+    op.create_table(
+        "admins",
+        sa.Column("admin_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_admins_admin_id", "admins", ["admin_id"], if_not_exists=True)
+
+    op.create_table(
+        "students",
+        sa.Column("student_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("usn", sa.String(), unique=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("password_hash", sa.String(), nullable=False),
+        sa.Column("branch", sa.String(), nullable=False),
+        sa.Column("year", sa.String(), nullable=False),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE")),
+        if_not_exists=True,
+    )
+    op.create_index("ix_students_student_id", "students", ["student_id"], if_not_exists=True)
+    op.create_index("ix_students_email", "students", ["email"], unique=True, if_not_exists=True)
+
+    op.create_table(
+        "face_embeddings",
+        sa.Column("embedding_id", sa.Integer(), primary_key=True),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.student_id", ondelete="CASCADE")),
+        sa.Column("embedding", sa.JSON(), nullable=False),
+        sa.Column("angle", sa.String()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_face_embeddings_embedding_id", "face_embeddings", ["embedding_id"], if_not_exists=True)
+
+    op.create_table(
+        "lecturer_groups",
+        sa.Column("lecturer_id", sa.Integer(), sa.ForeignKey("lecturers.lecturer_id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE"), primary_key=True),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        "study_materials",
+        sa.Column("material_id", sa.Integer(), primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE")),
+        sa.Column("uploaded_by", sa.Integer(), sa.ForeignKey("lecturers.lecturer_id", ondelete="CASCADE")),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("file_url", sa.String(), nullable=False),
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("uploaded_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_study_materials_material_id", "study_materials", ["material_id"], if_not_exists=True)
+
+    op.create_table(
+        "events",
+        sa.Column("event_id", sa.Integer(), primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE")),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("lecturers.lecturer_id", ondelete="CASCADE")),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("file_url", sa.String(), nullable=True),
+        sa.Column("file_name", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_events_event_id", "events", ["event_id"], if_not_exists=True)
+
+    op.create_table(
+        "doubt_clarification",
+        sa.Column("doubt_id", sa.Integer(), primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE")),
+        sa.Column("sender_id", sa.Integer(), nullable=False),
+        sa.Column("sender_role", recipient_role, nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("is_reply", sa.Boolean()),
+        sa.Column("parent_doubt_id", sa.Integer(), sa.ForeignKey("doubt_clarification.doubt_id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_doubt_clarification_doubt_id", "doubt_clarification", ["doubt_id"], if_not_exists=True)
+
+    op.create_table(
+        "documents",
+        sa.Column("document_id", sa.Integer(), primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE")),
+        sa.Column("uploaded_by", sa.Integer(), sa.ForeignKey("lecturers.lecturer_id", ondelete="CASCADE")),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("file_name", sa.String(), nullable=False),
+        sa.Column("deadline", sa.DateTime(), nullable=False),
+        sa.Column("uploaded_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_documents_document_id", "documents", ["document_id"], if_not_exists=True)
+
+    op.create_table(
+        "document_signatures",
+        sa.Column("signature_id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.document_id", ondelete="CASCADE")),
+        sa.Column("student_id", sa.Integer(), sa.ForeignKey("students.student_id", ondelete="CASCADE")),
+        sa.Column("signed_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_document_signatures_signature_id", "document_signatures", ["signature_id"],
+                    if_not_exists=True)
+
+    op.create_table(
+        "notifications",
+        sa.Column("notification_id", sa.Integer(), primary_key=True),
+        sa.Column("recipient_id", sa.Integer(), nullable=False),
+        sa.Column("recipient_role", recipient_role, nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("type", notification_type, nullable=False),
+        sa.Column("channel", notification_channel, nullable=False),
+        sa.Column("status", notification_status),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_notifications_notification_id", "notifications", ["notification_id"], if_not_exists=True)
+
+    op.create_table(
+        "otp_verifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("otp_hash", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("is_used", sa.Boolean()),
+        if_not_exists=True,
+    )
+    op.create_index("ix_otp_verifications_id", "otp_verifications", ["id"], if_not_exists=True)
+    op.create_index("ix_otp_verifications_email", "otp_verifications", ["email"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        "otp_verifications", "notifications", "document_signatures", "documents", "doubt_clarification",
+        "events", "study_materials", "lecturer_groups", "face_embeddings", "students", "admins",
+        "lecturers", "groups",
+    ):
+        op.drop_table(table, if_exists=True)
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,118 @@
+"""Notification outbox and inbox columns, deadline reminders, read markers, channel preference
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Columns are added nullable or with a constant default, which PostgreSQL
+11+ applies as a metadata-only change, so none of these rewrite a table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+recipient_role = postgresql.ENUM(name="recipientrole", create_type=False)
+notification_channel = postgresql.ENUM(name="notificationchannel", create_type=False)
+reminder_status = postgresql.ENUM("pending", "sent", "expired", name="reminderstatus", create_type=False)
+read_channel = postgresql.ENUM("chat", "materials", "events", "documents", name="readchannel", create_type=False)
+
+NOTIFICATION_COLUMNS = (
+    sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE"), nullable=True),
+    sa.Column("subject", sa.String(), nullable=True),
+    sa.Column("recipient_email", sa.String(), nullable=True),
+    sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+    sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    sa.Column("last_error", sa.String(), nullable=True),
+    sa.Column("item_title", sa.String(), nullable=True),
+    sa.Column("thread_id", sa.Integer(), sa.ForeignKey("doubt_clarification.doubt_id", ondelete="SET NULL"),
+              nullable=True),
+    sa.Column("read_at", sa.DateTime(), nullable=True),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # New enum labels cannot be used in the transaction that adds them
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'material_update'")
+        op.execute("ALTER TYPE notificationtype ADD VALUE IF NOT EXISTS 'document_update'")
+
+    bind = op.get_bind()
+    reminder_status.create(bind, checkfirst=True)
+    read_channel.create(bind, checkfirst=True)
+
+    op.add_column(
+        "students",
+        sa.Column("notification_channel", notification_channel, nullable=False, server_default="both"),
+        if_not_exists=True,
+    )
+    for column in NOTIFICATION_COLUMNS:
+        op.add_column("notifications", column, if_not_exists=True)
+
+    # Deleting a message deletes its replies: recreate the self-reference with
+    # ON DELETE CASCADE. NOT VALID skips the scan, so the exclusive lock is brief;
+    # the scan runs at the end, after that lock is released (see below)
+    op.execute("ALTER TABLE doubt_clarification DROP CONSTRAINT IF EXISTS doubt_clarification_parent_doubt_id_fkey")
+    op.execute(
+        "ALTER TABLE doubt_clarification ADD CONSTRAINT doubt_clarification_parent_doubt_id_fkey "
+        "FOREIGN KEY (parent_doubt_id) REFERENCES doubt_clarification (doubt_id) ON DELETE CASCADE NOT VALID"
+    )
+
+    op.create_table(
+        "deadline_reminders",
+        sa.Column("reminder_id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.document_id", ondelete="CASCADE"),
+                  nullable=False),
+        sa.Column("minutes_before", sa.Integer(), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=False),
+        sa.Column("status", reminder_status, nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("document_id", "minutes_before", name="uq_deadline_reminders_document_stage"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_deadline_reminders_reminder_id", "deadline_reminders", ["reminder_id"], if_not_exists=True)
+
+    op.create_table(
+        "read_markers",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("user_role", recipient_role, primary_key=True),
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.group_id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("channel", read_channel, primary_key=True),
+        sa.Column("last_read_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+
+    # The autocommit block commits the transaction above first, so VALIDATE runs
+    # on its own and only takes SHARE UPDATE EXCLUSIVE: reads and writes continue
+    # while it scans doubt_clarification
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE doubt_clarification VALIDATE CONSTRAINT doubt_clarification_parent_doubt_id_fkey")
+
+
+def downgrade() -> None:
+    """Downgrade schema. PostgreSQL cannot drop enum labels, so material_update/document_update stay."""
+    op.drop_table("read_markers", if_exists=True)
+    op.drop_table("deadline_reminders", if_exists=True)
+
+    op.execute("ALTER TABLE doubt_clarification DROP CONSTRAINT IF EXISTS doubt_clarification_parent_doubt_id_fkey")
+    op.execute(
+        "ALTER TABLE doubt_clarification ADD CONSTRAINT doubt_clarification_parent_doubt_id_fkey "
+        "FOREIGN KEY (parent_doubt_id) REFERENCES doubt_clarification (doubt_id)"
+    )
+
+    for column in reversed(NOTIFICATION_COLUMNS):
+        op.drop_column("notifications", column.name, if_exists=True)
+    op.drop_column("students", "notification_channel", if_exists=True)
+
+    bind = op.get_bind()
+    read_channel.drop(bind, checkfirst=True)
+    reminder_status.drop(bind, checkfirst=True)
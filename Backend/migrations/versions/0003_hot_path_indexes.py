@@ -0,0 +1,99 @@
+"""Hot-path indexes and the groups (branch, year) unique key, built concurrently
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Every index is built with CREATE INDEX CONCURRENTLY, so reads and writes
+continue while it builds. That cannot run inside a transaction, hence the
+autocommit block. A concurrent build that fails (deadlock, duplicate key)
+leaves an INVALID index behind, which IF NOT EXISTS would then skip; such
+leftovers are dropped and rebuilt, so the migration can simply be re-run.
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial index predicate)
+INDEXES = (
+    ("ix_students_group", "students", "group_id", None),
+    ("ix_study_materials_group_material", "study_materials", "group_id, material_id", None),
+    ("ix_events_group_event", "events", "group_id, event_id", None),
+    ("ix_doubt_clarification_group_created", "doubt_clarification", "group_id, created_at, doubt_id", None),
+    ("ix_doubt_clarification_group_doubt", "doubt_clarification", "group_id, doubt_id", None),
+    ("ix_doubt_clarification_parent", "doubt_clarification", "parent_doubt_id", None),
+    ("ix_documents_group_document", "documents", "group_id, document_id", None),
+    ("ix_documents_group_deadline", "documents", "group_id, deadline, document_id", None),
+    ("ix_document_signatures_document_student", "document_signatures", "document_id, student_id", None),
+    ("ix_document_signatures_student", "document_signatures", "student_id", None),
+    ("ix_notifications_pending_due", "notifications", "next_attempt_at", "status = 'pending'"),
+    ("ix_notifications_pending_group", "notifications", "group_id, type", "status = 'pending'"),
+    ("ix_notifications_pending_thread", "notifications", "thread_id, recipient_id",
+     "status = 'pending' AND thread_id IS NOT NULL"),
+    ("ix_notifications_thread", "notifications", "thread_id", "thread_id IS NOT NULL"),
+    ("ix_notifications_inbox", "notifications", "recipient_id, recipient_role, notification_id", None),
+    ("ix_notifications_inbox_unread", "notifications", "recipient_id, recipient_role, notification_id",
+     "read_at IS NULL AND channel <> 'email'"),
+    ("ix_deadline_reminders_pending_due", "deadline_reminders", "due_at", "status = 'pending'"),
+)
+
+
+def create_index_concurrently(name: str, table: str, columns: str, where: Optional[str] = None,
+                              unique: bool = False):
+    op.execute(f"""
+        DO $$ BEGIN
+            IF EXISTS (SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                       WHERE c.relname = '{name}' AND NOT i.indisvalid) THEN
+                RAISE NOTICE 'dropping invalid index {name}';
+                EXECUTE 'DROP INDEX {name}';
+            END IF;
+        END $$
+    """)
+    op.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"
+        + (f" WHERE {where}" if where else "")
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fail early with the offending rows rather than halfway through the index build
+    duplicates = op.get_bind().exec_driver_sql(
+        "SELECT branch, year, count(*) FROM groups GROUP BY branch, year HAVING count(*) > 1"
+    ).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{branch}-{year} ({count} rows)" for branch, year, count in duplicates)
+        raise RuntimeError(f"Merge duplicate groups before adding uq_groups_branch_year: {listed}")
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            create_index_concurrently(name, table, columns, where)
+
+        # Unique key on (branch, year): build the index concurrently, then attach it
+        # as the constraint, which only takes a brief lock
+        create_index_concurrently("uq_groups_branch_year", "groups", "branch, year", unique=True)
+        op.execute("""
+            DO $$ BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_groups_branch_year') THEN
+                    ALTER TABLE groups ADD CONSTRAINT uq_groups_branch_year UNIQUE USING INDEX uq_groups_branch_year;
+                END IF;
+            END $$
+        """)
+
+        # Fresh statistics so the planner sees the new indexes straight away
+        for table in sorted({table for _, table, _, _ in INDEXES} | {"groups"}):
+            op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE groups DROP CONSTRAINT IF EXISTS uq_groups_branch_year")
+        for name, _, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
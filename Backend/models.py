@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, ForeignKey, Boolean,
-    DateTime, Enum, JSON, func
+    DateTime, Enum, JSON, Index, UniqueConstraint, func, text
 )
 from sqlalchemy.orm import relationship
 from db import Base
@@ -17,6 +17,8 @@ class NotificationType(enum.Enum):
     document_reminder = "document_reminder"
     event_update = "event_update"
     doubt_reply = "doubt_reply"
+    material_update = "material_update"
+    document_update = "document_update"
 
 class NotificationChannel(enum.Enum):
     in_app = "in_app"
@@ -28,6 +30,17 @@ class NotificationStatus(enum.Enum):
     pending = "pending"
     failed = "failed"
 
+class ReminderStatus(enum.Enum):
+    pending = "pending"
+    sent = "sent"
+    expired = "expired"   # came due while the service was down and the deadline had already passed
+
+class ReadChannel(enum.Enum):
+    chat = "chat"
+    materials = "materials"
+    events = "events"
+    documents = "documents"
+
 # ---------- STUDENTS ----------
 class Student(Base):
     __tablename__ = "students"
@@ -39,11 +52,18 @@ class Student(Base):
     branch = Column(String, nullable=False)
     year = Column(String, nullable=False)
     group_id = Column(Integer, ForeignKey("groups.group_id", ondelete="CASCADE"))
+    # Where notifications reach this student; in_app skips email entirely
+    notification_channel = Column(Enum(NotificationChannel), nullable=False,
+                                  default=NotificationChannel.both, server_default="both")
 
     group = relationship("Group", back_populates="students")
     signatures = relationship("DocumentSignature", back_populates="student", cascade="all, delete-orphan")
     embeddings = relationship("FaceEmbedding", back_populates="student", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_students_group", "group_id"),
+    )
+
 # ---------- FACE EMBEDDINGS ----------
 class FaceEmbedding(Base):
     __tablename__ = "face_embeddings"
@@ -90,6 +110,10 @@ class Group(Base):
     doubts = relationship("DoubtClarification", back_populates="group", cascade="all, delete")
     documents = relationship("Document", back_populates="group", cascade="all, delete")
 
+    __table_args__ = (
+        UniqueConstraint("branch", "year", name="uq_groups_branch_year"),
+    )
+
 # ---------- LECTURER-GROUPS ----------
 class LecturerGroup(Base):
     __tablename__ = "lecturer_groups"
@@ -114,6 +138,10 @@ class StudyMaterial(Base):
     group = relationship("Group", back_populates="study_materials")
     uploader = relationship("Lecturer", back_populates="study_materials")
 
+    __table_args__ = (
+        Index("ix_study_materials_group_material", "group_id", "material_id"),
+    )
+
 # ---------- EVENTS ----------
 class Event(Base):
     __tablename__ = "events"
@@ -129,6 +157,10 @@ class Event(Base):
     group = relationship("Group", back_populates="events")
     creator = relationship("Lecturer", back_populates="events")
 
+    __table_args__ = (
+        Index("ix_events_group_event", "group_id", "event_id"),
+    )
+
 # ---------- DOUBT CLARIFICATION ----------
 class DoubtClarification(Base):
     __tablename__ = "doubt_clarification"
@@ -138,11 +170,20 @@ class DoubtClarification(Base):
     sender_role = Column(Enum(RecipientRole), nullable=False)
     message = Column(String, nullable=False)
     is_reply = Column(Boolean, default=False)
-    parent_doubt_id = Column(Integer, ForeignKey("doubt_clarification.doubt_id"), nullable=True)
+    parent_doubt_id = Column(Integer, ForeignKey("doubt_clarification.doubt_id", ondelete="CASCADE"), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
     group = relationship("Group", back_populates="doubts")
-    replies = relationship("DoubtClarification", cascade="all, delete")
+    replies = relationship("DoubtClarification", cascade="all, delete", passive_deletes=True)
+
+    __table_args__ = (
+        # Keyset pagination of a group's chat history
+        Index("ix_doubt_clarification_group_created", "group_id", "created_at", "doubt_id"),
+        # Unread counts above a read marker
+        Index("ix_doubt_clarification_group_doubt", "group_id", "doubt_id"),
+        # Reply trees, and the ON DELETE CASCADE from a parent message
+        Index("ix_doubt_clarification_parent", "parent_doubt_id"),
+    )
 
 # ---------- DOCUMENTS ----------
 class Document(Base):
@@ -160,6 +201,12 @@ class Document(Base):
     uploader = relationship("Lecturer", back_populates="documents")
     signatures = relationship("DocumentSignature", back_populates="document", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_documents_group_document", "group_id", "document_id"),
+        # Per-student status view: a group's documents in deadline order, keyset paged
+        Index("ix_documents_group_deadline", "group_id", "deadline", "document_id"),
+    )
+
 # ---------- DOCUMENT SIGNATURES ----------
 class DocumentSignature(Base):
     __tablename__ = "document_signatures"
@@ -171,6 +218,13 @@ class DocumentSignature(Base):
     document = relationship("Document", back_populates="signatures")
     student = relationship("Student", back_populates="signatures")
 
+    __table_args__ = (
+        # Anti-join for "who hasn't signed" probes (document_id, student_id) directly
+        Index("ix_document_signatures_document_student", "document_id", "student_id"),
+        # ON DELETE CASCADE from students
+        Index("ix_document_signatures_student", "student_id"),
+    )
+
 # ---------- NOTIFICATIONS ----------
 class Notification(Base):
     __tablename__ = "notifications"
@@ -184,6 +238,61 @@ class Notification(Base):
     created_at = Column(DateTime, server_default=func.now())
     sent_at = Column(DateTime, nullable=True)
 
+    # Outbox delivery state, see utils/notification_outbox.py
+    group_id = Column(Integer, ForeignKey("groups.group_id", ondelete="CASCADE"), nullable=True)
+    subject = Column(String, nullable=True)
+    recipient_email = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    last_error = Column(String, nullable=True)
+    item_title = Column(String, nullable=True)  # listed when rows are merged into a digest
+    thread_id = Column(Integer, ForeignKey("doubt_clarification.doubt_id", ondelete="SET NULL"), nullable=True)  # replied-to message, NULL once deleted
+    read_at = Column(DateTime, nullable=True)  # in-app inbox, see routes/notifications.py
+
+    __table_args__ = (
+        # Dispatcher claims: only pending rows, oldest due first
+        Index("ix_notifications_pending_due", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+        # Open digest window lookup per (group, type)
+        Index("ix_notifications_pending_group", "group_id", "type", postgresql_where=text("status = 'pending'")),
+        # Open reply window lookup per (thread, recipient)
+        Index("ix_notifications_pending_thread", "thread_id", "recipient_id",
+              postgresql_where=text("status = 'pending' AND thread_id IS NOT NULL")),
+        # ON DELETE SET NULL from a deleted chat message; most rows have no thread
+        Index("ix_notifications_thread", "thread_id", postgresql_where=text("thread_id IS NOT NULL")),
+        # Inbox pages, newest first, per recipient
+        Index("ix_notifications_inbox", "recipient_id", "recipient_role", "notification_id"),
+        # Unread inbox rows only: unread counts and mark-read touch a tiny index
+        Index("ix_notifications_inbox_unread", "recipient_id", "recipient_role", "notification_id",
+              postgresql_where=text("read_at IS NULL AND channel <> 'email'")),
+    )
+
+# ---------- DEADLINE REMINDERS ----------
+class DeadlineReminder(Base):
+    """A persisted reminder, so scheduled reminders survive restarts"""
+    __tablename__ = "deadline_reminders"
+    reminder_id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.document_id", ondelete="CASCADE"), nullable=False)
+    minutes_before = Column(Integer, nullable=False)
+    due_at = Column(DateTime, nullable=False)
+    status = Column(Enum(ReminderStatus), nullable=False, default=ReminderStatus.pending)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("document_id", "minutes_before", name="uq_deadline_reminders_document_stage"),
+        Index("ix_deadline_reminders_pending_due", "due_at", postgresql_where=text("status = 'pending'")),
+    )
+
+# ---------- READ MARKERS ----------
+class ReadMarker(Base):
+    """Highest item id a user has seen in one channel of one group"""
+    __tablename__ = "read_markers"
+    user_id = Column(Integer, primary_key=True)
+    user_role = Column(Enum(RecipientRole), primary_key=True)
+    group_id = Column(Integer, ForeignKey("groups.group_id", ondelete="CASCADE"), primary_key=True)
+    channel = Column(Enum(ReadChannel), primary_key=True)
+    last_read_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
 # --------------OTP Verification------------
 class OTPVerification(Base):
     __tablename__ = "otp_verifications"
@@ -6,6 +6,7 @@ from models import Lecturer, Student, Group, Admin
 from pydantic import BaseModel
 from utils.send_password import generate_hybrid_password, send_password_email as send_email
 from utils.auth_utils import get_current_user
+from utils.query_metrics import query_metrics
 from passlib.context import CryptContext
 
 router = APIRouter()
@@ -190,6 +191,14 @@ def get_group_distribution(db: Session = Depends(get_db), current_user: dict = D
         })
     return data
 
+# 5. Database pools and per-route query counts
+@router.get("/db-stats")
+def get_db_stats(current_user: dict = Depends(get_current_user)):
+    # Check if user is admin
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can perform this action")
+    return query_metrics.stats()
+
 # Create Admin User (for initial setup)
 @router.post("/create-admin")
 def create_admin(admin_data: AdminCreate, db: Session = Depends(get_db)):
@@ -1,21 +1,48 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from db import get_db
-from models import DoubtClarification, Student, Lecturer
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from db import AsyncSessionLocal
+from models import Student, Lecturer
 from utils.auth_utils import get_current_user_from_token
 from utils.websocket_manager import ConnectionManager
-from utils.email_notifications import email_service
+from utils.chat_writer import chat_writer
+from utils.chat_cache import recent_messages, delete_thread
+from routes.sse import broadcast_unread
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 manager = ConnectionManager()
 
+# -----------------------------
+# DB helpers. Each one opens its own short-lived async session so a socket
+# never holds a pool connection while it sits idle, and its queries are
+# awaited instead of blocking the event loop.
+# -----------------------------
+async def load_user_name(role: str, user_id: int):
+    async with AsyncSessionLocal() as db:
+        if role == "student":
+            return await db.scalar(select(Student.name).where(Student.student_id == user_id))
+        return await db.scalar(select(Lecturer.name).where(Lecturer.lecturer_id == user_id))
+
+
+async def load_history(group_id: int):
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(recent_messages.snapshot, group_id)
+
+
+async def delete_message(doubt_id: int, sender_id: int, sender_role: str) -> list:
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(delete_thread, doubt_id, sender_id, sender_role)
+
+
 @router.websocket("/ws/group/{group_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
-    group_id: int,
-    db: Session = Depends(get_db)
+    group_id: int
 ):
-    
+
     # ✅ Extract token before accepting the connection
     token = websocket.query_params.get("token")
     if not token:
@@ -33,12 +60,9 @@ async def websocket_endpoint(
     await websocket.accept()
 
     # 🔹 Fetch user name from DB using role and id
-    if user_data["role"] == "student":
-        user = db.query(Student).filter(Student.student_id == user_data["id"]).first()
-    else:
-        user = db.query(Lecturer).filter(Lecturer.lecturer_id == user_data["id"]).first()
+    user_name = await load_user_name(user_data["role"], user_data["id"])
 
-    if not user:
+    if user_name is None:
         await websocket.close(code=1008)
         return
 
@@ -46,7 +70,7 @@ async def websocket_endpoint(
         "id": user_data["id"],
         "email": user_data["email"],
         "role": user_data["role"],
-        "name": user.name
+        "name": user_name
     }
 
     # 🔹 Connect and announce
@@ -56,71 +80,68 @@ async def websocket_endpoint(
         "message": f"{current_user['name']} joined the chat"
     })
 
+    # 🔹 Recent history straight from the in-memory ring, no HTTP round trip needed
+    history = await load_history(group_id)
+    await manager.send_personal(websocket, group_id, {
+        "type": "history",
+        "messages": jsonable_encoder(history)
+    })
+
     try:
         while True:
             data = await websocket.receive_json()
+            manager.touch(websocket, group_id)
             action = data.get("action")
 
+            # 🔁 Keepalive reply, nothing else to do
+            if action == "pong":
+                continue
+
             # 🟩 Sending new message
             if action == "send":
                 message_text = data.get("message")
                 parent_id = data.get("parent_id")
 
-                new_message = DoubtClarification(
-                    group_id=group_id,
-                    sender_id=current_user["id"],
-                    sender_role=current_user["role"],
-                    message=message_text,
-                    parent_doubt_id=parent_id
-                )
-                db.add(new_message)
-                db.commit()
-                db.refresh(new_message)
-
-                # Send email notification if this is a reply
-                if parent_id is not None:
-                    try:
-                        email_service.send_reply_notification(
-                            db=db,
-                            parent_message_id=parent_id,
-                            replier_name=current_user["name"],
-                            replier_role=current_user["role"],
-                            replier_id=current_user["id"]
-                        )
-                    except Exception as e:
-                        # Log error but don't fail the message send
-                        import logging
-                        logging.getLogger(__name__).error(f"Failed to send reply notification: {e}")
-
-                await manager.broadcast(group_id, {
-                    "type": "message",
-                    "doubt_id": new_message.doubt_id,
-                    "message": new_message.message,
-                    "sender_id": new_message.sender_id,
-                    "sender_role": new_message.sender_role.value
-                        if hasattr(new_message.sender_role, "value")
-                        else new_message.sender_role,
-                    "sender_name": current_user["name"],
-                    "created_at": str(new_message.created_at),
-                    "reply_to": new_message.parent_doubt_id
+                # A reply's email notification is queued in the outbox by the same commit
+                try:
+                    saved = await chat_writer.write(
+                        group_id,
+                        current_user["id"],
+                        current_user["role"],
+                        message_text,
+                        parent_id,
+                        sender_name=current_user["name"]
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to save chat message: {e}")
+                    await manager.send_personal(websocket, group_id, {
+                        "type": "error",
+                        "message": "Failed to send message"
+                    })
+                    continue
+
+                message = {**saved, "sender_name": current_user["name"]}
+                recent_messages.append(group_id, message)
+                await manager.broadcast(group_id, {"type": "message", **message})
+                await broadcast_unread(group_id, "chat", message["doubt_id"], {
+                    "id": current_user["id"],
+                    "role": current_user["role"]
                 })
 
             # 🟥 Deleting a message
             elif action == "delete":
                 doubt_id = data.get("doubt_id")
-                msg = db.query(DoubtClarification).filter(
-                    DoubtClarification.doubt_id == doubt_id
-                ).first()
+                deleted = await delete_message(doubt_id, current_user["id"], current_user["role"])
 
-                if msg and msg.sender_id == current_user["id"]:
-                    db.delete(msg)
-                    db.commit()
+                if deleted:
+                    recent_messages.remove(group_id, deleted)
                     await manager.broadcast(group_id, {
                         "type": "delete",
-                        "doubt_id": doubt_id
+                        "doubt_id": doubt_id,
+                        "deleted_ids": deleted
                     })
                 else:
-                    await websocket.send_json({
+                    await manager.send_personal(websocket, group_id, {
                         "type": "error",
                         "message": "Cannot delete this message"
                     })
@@ -130,4 +151,4 @@ async def websocket_endpoint(
         await manager.broadcast(group_id, {
             "type": "status",
             "message": f"{current_user['name']} left the chat"
-        })
\ No newline at end of file
+        })
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from sqlalchemy.orm import Session
-from db import get_db
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_async_db
 from models import Student, FaceEmbedding, Group
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import serialization, hashes
@@ -63,7 +65,7 @@ async def face_verify_register(
     usn: str = Form(...),
     branch: str = Form(...),
     year: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # --------------------------
@@ -111,16 +113,16 @@ async def face_verify_register(
             # 3 Verification passed → store student
             group_name = f"{branch}-{year}"
 
-            group = db.query(Group).filter_by(branch=branch, year=year).first()
+            group = await db.scalar(select(Group).where(Group.branch == branch, Group.year == year))
             if not group:
-                group = Group(
-                    branch=branch,
-                    year=year,
-                    group_name=group_name
+                # Another registration may create the group first; uq_groups_branch_year makes that a no-op
+                await db.execute(
+                    insert(Group)
+                    .values(branch=branch, year=year, group_name=group_name)
+                    .on_conflict_do_nothing(index_elements=["branch", "year"])
                 )
-                db.add(group)
-                db.commit()
-                db.refresh(group)
+                await db.commit()
+                group = await db.scalar(select(Group).where(Group.branch == branch, Group.year == year))
             
             hashed_pw = pwd_context.hash(password)
             student = Student(
@@ -133,8 +135,7 @@ async def face_verify_register(
                 group_id=group.group_id
             )
             db.add(student)
-            db.commit()
-            db.refresh(student)
+            await db.commit()
 
             # 4 Store embeddings
             embeddings = [emb1, emb2, emb3]
@@ -146,7 +147,7 @@ async def face_verify_register(
                     angle=angle
                 )
                 db.add(face_emb)
-            db.commit()
+            await db.commit()
 
             return {
                 "message": "confirmation done",
@@ -162,9 +163,9 @@ async def face_verify_register(
                 "similarities": {"sim12": sim12, "sim13": sim13, "sim23": sim23}
             }
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Student with this email or USN already exists")
 
     except Exception as e:
-        db.rollback
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
 from db import get_db
 from models import Group, LecturerGroup
 from utils.auth_utils import get_current_user    
@@ -46,11 +47,15 @@ def add_or_join_group(
     group = db.query(Group).filter(Group.branch == branch, Group.year == year).first()
 
     if not group:
-        # Create group (year stored as string)
-        group = Group(branch=branch, year=year, group_name=group_name)
-        db.add(group)
+        # Create group (year stored as string); a concurrent request may create
+        # it first, uq_groups_branch_year turns that into a no-op
+        db.execute(
+            insert(Group)
+            .values(branch=branch, year=year, group_name=group_name)
+            .on_conflict_do_nothing(index_elements=["branch", "year"])
+        )
         db.commit()
-        db.refresh(group)
+        group = db.query(Group).filter(Group.branch == branch, Group.year == year).one()
 
     # Check if lecturer is already linked
     existing_link = db.query(LecturerGroup).filter(
@@ -0,0 +1,157 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, select, update
+from pydantic import BaseModel
+from db import get_db
+from models import Notification, NotificationChannel, RecipientRole, Student
+from utils.auth_utils import get_current_user
+from utils.inbox import INBOX_CHANNELS
+from utils.notification_outbox import notification_dispatcher, outbox_backlog
+from utils.mail_scheduler import mail_scheduler
+
+router = APIRouter()
+
+INBOX_PAGE_SIZE = 20
+UNREAD_CAP = 100  # the count stops here, so it is a bounded scan of the unread index
+
+
+class MarkReadRequest(BaseModel):
+    notification_ids: Optional[List[int]] = None
+    up_to_id: Optional[int] = None  # everything up to and including this id
+
+
+class PreferenceRequest(BaseModel):
+    channel: NotificationChannel
+
+
+def inbox_owner(current_user: dict):
+    """(recipient_id, recipient_role) filter for the current user's inbox rows"""
+    if current_user["role"] not in ("student", "lecturer"):
+        raise HTTPException(status_code=403, detail="Only students and lecturers have an inbox")
+    return (
+        Notification.recipient_id == current_user["id"],
+        Notification.recipient_role == RecipientRole(current_user["role"]),
+        Notification.channel.in_(INBOX_CHANNELS)
+    )
+
+
+# -----------------------------
+# In-app inbox: newest first, keyset paged by notification_id
+# -----------------------------
+@router.get("/inbox")
+def get_inbox(before_id: Optional[int] = None, limit: int = INBOX_PAGE_SIZE, unread_only: bool = False,
+              db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    query = db.query(
+        Notification.notification_id,
+        Notification.type,
+        Notification.subject,
+        Notification.message,
+        Notification.group_id,
+        Notification.created_at,
+        Notification.read_at
+    ).filter(*inbox_owner(current_user))
+    if unread_only:
+        query = query.filter(Notification.read_at.is_(None))
+    if before_id is not None:
+        query = query.filter(Notification.notification_id < before_id)
+    rows = query.order_by(Notification.notification_id.desc()).limit(min(limit, 100)).all()
+    return [
+        {
+            "notification_id": r.notification_id,
+            "type": r.type.value,
+            "subject": r.subject,
+            "message": r.message,
+            "group_id": r.group_id,
+            "created_at": r.created_at,
+            "read": r.read_at is not None
+        }
+        for r in rows
+    ]
+
+
+@router.get("/inbox/unread-count")
+def get_unread_count(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    unread = (
+        select(Notification.notification_id)
+        .where(*inbox_owner(current_user), Notification.read_at.is_(None))
+        .limit(UNREAD_CAP)
+        .subquery()
+    )
+    return {"unread": db.execute(select(func.count()).select_from(unread)).scalar()}
+
+
+@router.post("/inbox/read")
+def mark_inbox_read(request: MarkReadRequest, db: Session = Depends(get_db),
+                    current_user: dict = Depends(get_current_user)):
+    """Mark a batch of notifications read in one UPDATE, by id list and/or up to an id"""
+    selectors = []
+    if request.notification_ids:
+        selectors.append(Notification.notification_id.in_(request.notification_ids))
+    if request.up_to_id is not None:
+        selectors.append(Notification.notification_id <= request.up_to_id)
+    if not selectors:
+        raise HTTPException(status_code=400, detail="Give notification_ids or up_to_id")
+
+    result = db.execute(
+        update(Notification)
+        .where(*inbox_owner(current_user), Notification.read_at.is_(None), or_(*selectors))
+        .values(read_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return {"marked_read": result.rowcount}
+
+
+# -----------------------------
+# Student delivery preference: in_app, email or both
+# -----------------------------
+@router.get("/preferences")
+def get_preferences(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "student":
+        raise HTTPException(status_code=403, detail="Only students can set notification preferences")
+    channel = db.query(Student.notification_channel).filter(Student.student_id == current_user["id"]).scalar()
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {"channel": channel.value}
+
+
+@router.put("/preferences")
+def set_preferences(request: PreferenceRequest, db: Session = Depends(get_db),
+                    current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "student":
+        raise HTTPException(status_code=403, detail="Only students can set notification preferences")
+    updated = db.query(Student).filter(Student.student_id == current_user["id"]).update(
+        {Student.notification_channel: request.channel}, synchronize_session=False
+    )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Student not found")
+    db.commit()
+    return {"channel": request.channel.value}
+
+
+# -----------------------------
+# Outbox health: backlog from the database, throughput from this process
+# -----------------------------
+@router.get("/outbox/stats")
+def get_outbox_stats(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view outbox stats")
+
+    return {
+        **outbox_backlog(db),
+        "sent_per_second": notification_dispatcher.throughput(),
+        "workers": notification_dispatcher.workers,
+        **{f"{key}_total": value for key, value in notification_dispatcher.metrics.items()}
+    }
+
+
+# -----------------------------
+# Mail scheduler: queue depth, wait times and remaining quota per priority class
+# -----------------------------
+@router.get("/mail/stats")
+def get_mail_stats(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view mail stats")
+
+    return mail_scheduler.stats()
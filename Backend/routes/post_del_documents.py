@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from db import get_db
-from models import Document, Group, LecturerGroup, Lecturer
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, get_async_db
+from models import Document, DocumentSignature, Group, LecturerGroup, Lecturer, Student, NotificationType
 from utils.auth_utils import get_current_user
 from utils.email_notifications import email_service
+from utils.notification_outbox import enqueue_group, notification_dispatcher
+from utils.inbox import inbox_hub
 from fastapi.responses import FileResponse
 import os
 import asyncio
-from routes.sse import broadcast_document,broadcast_document_delete
+from routes.sse import broadcast_document,broadcast_document_delete,broadcast_unread
 from datetime import datetime
 
 router = APIRouter()
@@ -24,7 +29,7 @@ async def upload_document(
     title: str = Form(...),
     deadline: str = Form(...),  
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     # Role check
@@ -32,11 +37,10 @@ async def upload_document(
         raise HTTPException(status_code=403, detail="Only lecturers can upload documents")
 
     lecturer_id = current_user["id"]
-    lecturer = db.query(Lecturer).filter_by(lecturer_id=lecturer_id).first()
-    author_name = lecturer.name if lecturer else "Lecturer"
+    author_name = await db.scalar(select(Lecturer.name).where(Lecturer.lecturer_id == lecturer_id)) or "Lecturer"
 
     # Check if lecturer is linked to the group
-    group = db.query(Group).filter_by(group_id=group_id).first()
+    group = await db.get(Group, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     file_url, file_name = None, None
@@ -61,8 +65,13 @@ async def upload_document(
         deadline=deadline_dt
     )
     db.add(document)
-    db.commit()
-    db.refresh(document)
+    # One notification per student, committed together with the document
+    notifications = await db.run_sync(
+        enqueue_group, group_id, NotificationType.document_update, *email_service.document_message(author_name, title),
+        item_title=f"{title} by {author_name}"
+    )
+    await db.commit()
+    await db.refresh(document)
     document_data={
         "id": document.document_id,
         "title": title,
@@ -75,26 +84,34 @@ async def upload_document(
         "fileName":file_name
     }
     
-    # Send email notifications asynchronously
-    asyncio.create_task(email_service.send_document_notification(db, group_id, author_name, title))
+    # Dispatch the queued email notifications now rather than at the next poll
+    notification_dispatcher.wake()
+    inbox_hub.publish(notifications)
     
     # Schedule deadline reminder (30 minutes before deadline)
-    email_service.schedule_deadline_reminder(document.document_id, deadline_dt)
+    await run_in_threadpool(email_service.schedule_deadline_reminder, document.document_id, deadline_dt)
     
     # Broadcast asynchronously (fire-and-forget)
     asyncio.create_task(broadcast_document(group_id, document_data))
+    asyncio.create_task(broadcast_unread(group_id, "documents", document.document_id))
     return document_data
 
 
 @router.get("/list-documents")
-def list_documents(group_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    # Check if group exists
+def list_documents(
+    group_id: int,
+    include_signatures: bool = True,
+    count_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
     role = current_user["role"]
     user_id = current_user["id"]
     if role != "lecturer":
         raise HTTPException(status_code=403, detail="Only lecturers can access this endpoint")
+    # The link row references the group, so this also proves the group exists
     link_exists = (
-        db.query(LecturerGroup)
+        db.query(LecturerGroup.group_id)
         .filter(
             LecturerGroup.lecturer_id == user_id,
             LecturerGroup.group_id == group_id
@@ -103,36 +120,65 @@ def list_documents(group_id: int, db: Session = Depends(get_db), current_user: d
     )
     if not link_exists:
         raise HTTPException(status_code=403, detail="Lecturer not linked with this group")
-    group = db.query(Group).filter_by(group_id=group_id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
 
-    # Fetch documents for the group
-    documents = db.query(Document).filter_by(group_id=group_id).all()
-    for doc in documents:
-        lecturer = db.query(Lecturer).filter_by(lecturer_id=doc.uploaded_by).first()
-        author_name = lecturer.name if lecturer else "Lecturer"
+    signature_count = (
+        select(func.count(DocumentSignature.signature_id))
+        .where(DocumentSignature.document_id == Document.document_id)
+        .correlate(Document)
+        .scalar_subquery()
+    )
+
+    # Dashboard badges: totals only, one round trip
+    if count_only:
+        documents, signatures = (
+            db.query(func.count(Document.document_id), func.coalesce(func.sum(signature_count), 0))
+            .filter(Document.group_id == group_id)
+            .one()
+        )
+        return {"group_id": group_id, "document_count": documents, "signature_count": signatures}
+
+    # Author name joined in; signatures (with their students) come in one extra
+    # SELECT ... IN for all documents, or as a per-document count instead
+    query = (
+        db.query(Document, func.coalesce(Lecturer.name, "Lecturer"))
+        .outerjoin(Lecturer, Lecturer.lecturer_id == Document.uploaded_by)
+        .filter(Document.group_id == group_id)
+    )
+    if include_signatures:
+        query = query.options(
+            selectinload(Document.signatures)
+            .joinedload(DocumentSignature.student)
+            .load_only(Student.usn, Student.name)
+        )
+    else:
+        query = query.add_columns(signature_count)
+
     response = []
-    for doc in documents:
-        response.append({
+    for doc, author_name, *counts in query.all():
+        item = {
             "id": doc.document_id,
             "title": doc.title,
             "group_id": doc.group_id,
             "uploadedBy": doc.uploaded_by,
             "author_name": author_name,
-            "signatures": [
-            {
-                "usn": sig.student.usn,
-                "name": sig.student.name,
-                "signed_at": sig.signed_at
-            }
-            for sig in doc.signatures
-        ],
             "deadline": doc.deadline.isoformat(),
             "uploaded_at": doc.uploaded_at.isoformat(),
             "fileUrl": doc.file_path,
             "fileName": doc.file_name
-        })
+        }
+        if include_signatures:
+            item["signatures"] = [
+                {
+                    "usn": sig.student.usn,
+                    "name": sig.student.name,
+                    "signed_at": sig.signed_at
+                }
+                for sig in doc.signatures
+            ]
+            item["signature_count"] = len(doc.signatures)
+        else:
+            item["signature_count"] = counts[0]
+        response.append(item)
 
     return response
 # -------------------
@@ -140,15 +186,17 @@ def list_documents(group_id: int, db: Session = Depends(get_db), current_user: d
 # -------------------
 @router.delete("/delete/{document_id}")
 async def delete_document(
-    document_id: str,
-    db: Session = Depends(get_db),
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user["role"] != "lecturer":
         raise HTTPException(status_code=403, detail="Only lecturers can delete documents")
 
     lecturer_id = current_user["id"]
-    document = db.query(Document).filter_by(document_id=document_id, uploaded_by=lecturer_id).first()
+    document = await db.scalar(select(Document).where(
+        Document.document_id == document_id, Document.uploaded_by == lecturer_id
+    ))
     if not document:
         raise HTTPException(status_code=404, detail="Document not found or not authorized")
 
@@ -161,14 +209,14 @@ async def delete_document(
             os.remove(file_path)
 
     # Cancel scheduled deadline reminder
-    email_service.cancel_deadline_reminder(document_id)
+    await run_in_threadpool(email_service.cancel_deadline_reminder, document_id)
     
     # Delete from DB
-    db.delete(document)
-    db.commit()
+    await db.delete(document)
+    await db.commit()
 
     # 🧠 Broadcast delete event
-    await broadcast_document_delete(group_id, document_id)
+    await broadcast_document_delete(group_id, str(document_id))
 
     return {"detail": f"Document {document_id} deleted successfully"}
 
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_async_db
 from fastapi.responses import FileResponse
-from models import StudyMaterial, Event, LecturerGroup, Lecturer
+from models import StudyMaterial, Event, LecturerGroup, Lecturer, NotificationType
 from utils.auth_utils import get_current_user
 from utils.email_notifications import email_service
+from utils.notification_outbox import enqueue_group, notification_dispatcher
+from utils.inbox import inbox_hub
 from datetime import datetime
 import os
 import asyncio
-from routes.sse import broadcast_announcement,broadcast_announcement_delete
+from routes.sse import broadcast_announcement,broadcast_announcement_delete,broadcast_unread
 
 router = APIRouter()
 
@@ -26,7 +29,7 @@ async def create_announcement(
     targetYear: str = Form(None),
     targetBranch: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     # Role check
@@ -34,13 +37,12 @@ async def create_announcement(
         raise HTTPException(status_code=403, detail="Only lecturers can create announcements")
 
     lecturer_id = current_user["id"]
-    lecturer = db.query(Lecturer).filter_by(lecturer_id=lecturer_id).first()
-    author_name = lecturer.name if lecturer else "Lecturer"
+    author_name = await db.scalar(select(Lecturer.name).where(Lecturer.lecturer_id == lecturer_id)) or "Lecturer"
 
     # Check if lecturer is linked to the group
-    link_exists = db.query(LecturerGroup).filter_by(
-        group_id=group_id, lecturer_id=lecturer_id
-    ).first()
+    link_exists = await db.scalar(select(LecturerGroup.group_id).where(
+        LecturerGroup.group_id == group_id, LecturerGroup.lecturer_id == lecturer_id
+    ))
     if not link_exists:
         raise HTTPException(status_code=403, detail="Lecturer not linked with this group")
 
@@ -75,10 +77,20 @@ async def create_announcement(
     else:
         raise HTTPException(status_code=400, detail="Invalid announcement type")
 
-    #saves to db
+    #saves to db, with one notification per student in the same transaction
     db.add(db_ann)
-    db.commit()
-    db.refresh(db_ann)
+    if type == "material":
+        notifications = await db.run_sync(
+            enqueue_group, group_id, NotificationType.material_update, *email_service.material_message(author_name, title),
+            item_title=f"{title} by {author_name}"
+        )
+    else:
+        notifications = await db.run_sync(
+            enqueue_group, group_id, NotificationType.event_update, *email_service.event_message(author_name, title),
+            item_title=f"{title} by {author_name}"
+        )
+    await db.commit()
+    await db.refresh(db_ann)
     announcement_data={
         "id": f"{type}-{db_ann.material_id if type == 'material' else db_ann.event_id}",
         "group_id": group_id,
@@ -93,20 +105,23 @@ async def create_announcement(
         "fileName": file_name,
     }
     
-    # Send email notifications asynchronously
-    if type == "material":
-        asyncio.create_task(email_service.send_material_notification(db, group_id, author_name, title))
-    elif type == "event":
-        asyncio.create_task(email_service.send_event_notification(db, group_id, author_name, title))
+    # Dispatch the queued email notifications now rather than at the next poll
+    notification_dispatcher.wake()
+    inbox_hub.publish(notifications)
     
     # Broadcast asynchronously (fire-and-forget)
     asyncio.create_task(broadcast_announcement(group_id, announcement_data))
+    asyncio.create_task(broadcast_unread(
+        group_id,
+        "materials" if type == "material" else "events",
+        db_ann.material_id if type == "material" else db_ann.event_id
+    ))
     return announcement_data
 
 @router.delete("/delete-announcements/{ann_id}")
 async def delete_announcement(
     ann_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     # Only lecturers can delete
@@ -124,7 +139,9 @@ async def delete_announcement(
 
     # Delete study material
     if ann_type == "material":
-        ann = db.query(StudyMaterial).filter_by(material_id=ann_id_num, uploaded_by=lecturer_id).first()
+        ann = await db.scalar(select(StudyMaterial).where(
+            StudyMaterial.material_id == ann_id_num, StudyMaterial.uploaded_by == lecturer_id
+        ))
         if not ann:
             raise HTTPException(status_code=404, detail="Material not found or not authorized")
 
@@ -136,8 +153,8 @@ async def delete_announcement(
             if os.path.exists(file_path):
                 os.remove(file_path)
 
-        db.delete(ann)
-        db.commit()
+        await db.delete(ann)
+        await db.commit()
 
         # Broadcast to all subscribers in that group
         await broadcast_announcement_delete(group_id, ann_id)
@@ -145,7 +162,7 @@ async def delete_announcement(
 
     # Delete event
     elif ann_type == "event":
-        ann = db.query(Event).filter_by(event_id=ann_id_num, created_by=lecturer_id).first()
+        ann = await db.scalar(select(Event).where(Event.event_id == ann_id_num, Event.created_by == lecturer_id))
         if not ann:
             raise HTTPException(status_code=404, detail="Event not found or not authorized")
 
@@ -156,8 +173,8 @@ async def delete_announcement(
             if os.path.exists(file_path):
                 os.remove(file_path)
 
-        db.delete(ann)
-        db.commit()
+        await db.delete(ann)
+        await db.commit()
 
         await broadcast_announcement_delete(group_id, ann_id)
         return {"detail": f"Event {ann_id} deleted successfully"}
@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, literal, not_, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from pydantic import BaseModel
+from db import get_db
+from models import (
+    DoubtClarification, StudyMaterial, Event, Document, Student, LecturerGroup,
+    ReadMarker, ReadChannel, RecipientRole
+)
+from utils.auth_utils import get_current_user
+from routes.students_groups_get import ensure_group_access
+
+router = APIRouter()
+
+UNREAD_CAP = 100  # counts stop here, so each one is a bounded index range scan
+
+# channel -> (table, id column) whose ids are compared with the read marker
+CHANNEL_SOURCES = {
+    ReadChannel.chat: (DoubtClarification, DoubtClarification.doubt_id),
+    ReadChannel.materials: (StudyMaterial, StudyMaterial.material_id),
+    ReadChannel.events: (Event, Event.event_id),
+    ReadChannel.documents: (Document, Document.document_id),
+}
+
+
+class MarkReadRequest(BaseModel):
+    group_id: int
+    channel: ReadChannel
+    last_read_id: int
+
+
+def user_group_ids(db: Session, current_user: dict) -> list:
+    if current_user["role"] == "student":
+        student = db.query(Student.group_id).filter(Student.student_id == current_user["id"]).first()
+        return [student.group_id] if student and student.group_id else []
+    if current_user["role"] == "lecturer":
+        rows = db.query(LecturerGroup.group_id).filter(LecturerGroup.lecturer_id == current_user["id"]).all()
+        return [r.group_id for r in rows]
+    return []
+
+
+def unread_statement(user_id: int, role: RecipientRole, group_ids: list):
+    """One UNION ALL statement with a capped range count per (group, channel)"""
+    parts = []
+    for group_id in group_ids:
+        for channel, (model, id_column) in CHANNEL_SOURCES.items():
+            marker = (
+                select(ReadMarker.last_read_id)
+                .where(
+                    ReadMarker.user_id == user_id,
+                    ReadMarker.user_role == role,
+                    ReadMarker.group_id == group_id,
+                    ReadMarker.channel == channel
+                )
+                .scalar_subquery()
+            )
+            unread = select(literal(1)).where(
+                model.group_id == group_id,
+                id_column > func.coalesce(marker, 0)
+            )
+            if channel == ReadChannel.chat:
+                # Your own messages are never unread
+                unread = unread.where(not_(and_(
+                    DoubtClarification.sender_id == user_id,
+                    DoubtClarification.sender_role == role
+                )))
+            capped = unread.limit(UNREAD_CAP).subquery()
+            parts.append(select(
+                literal(group_id).label("group_id"),
+                literal(channel.value).label("channel"),
+                select(func.count()).select_from(capped).scalar_subquery().label("unread")
+            ))
+    return union_all(*parts)
+
+
+# -----------------------------
+# Unread counts for every group of the current user, in one query
+# -----------------------------
+@router.get("/unread")
+def get_unread_counts(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ("student", "lecturer"):
+        raise HTTPException(status_code=403, detail="Only students and lecturers have unread counts")
+
+    group_ids = user_group_ids(db, current_user)
+    if not group_ids:
+        return {"groups": {}, "cap": UNREAD_CAP}
+
+    role = RecipientRole(current_user["role"])
+    counts = {group_id: {} for group_id in group_ids}
+    for row in db.execute(unread_statement(current_user["id"], role, group_ids)):
+        counts[row.group_id][row.channel] = row.unread
+    return {"groups": counts, "cap": UNREAD_CAP}
+
+
+# -----------------------------
+# Move a read marker forward
+# -----------------------------
+@router.post("/mark-read")
+def mark_read(data: MarkReadRequest, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ("student", "lecturer"):
+        raise HTTPException(status_code=403, detail="Only students and lecturers have read markers")
+    ensure_group_access(db, current_user, data.group_id)
+
+    stmt = insert(ReadMarker).values(
+        user_id=current_user["id"],
+        user_role=RecipientRole(current_user["role"]),
+        group_id=data.group_id,
+        channel=data.channel,
+        last_read_id=data.last_read_id
+    )
+    # High-water mark: never move backwards, e.g. when an old tab reports late
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReadMarker.user_id, ReadMarker.user_role, ReadMarker.group_id, ReadMarker.channel],
+        set_={
+            "last_read_id": func.greatest(ReadMarker.last_read_id, stmt.excluded.last_read_id),
+            "updated_at": func.now()
+        }
+    ).returning(ReadMarker.last_read_id)
+    last_read_id = db.execute(stmt).scalar_one()
+    db.commit()
+
+    return {"group_id": data.group_id, "channel": data.channel.value, "last_read_id": last_read_id}
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import cv2, numpy as np
 import insightface
 from models import DocumentSignature,FaceEmbedding, Document
-from db import get_db, SessionLocal
+from db import get_async_db
 from utils.auth_utils import get_current_user 
 
 router=APIRouter()
@@ -43,21 +44,22 @@ def cosine_similarity(emb1, emb2):
 async def sign_document(
     document_id: int,
     images: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     student_id = current_user["id"]
     if current_user["role"] != "student":
         raise HTTPException(status_code=403, detail="Only students can sign documents")
-    doc = db.query(Document).filter_by(document_id=document_id).first()
+    doc = await db.get(Document, document_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     if not images or len(images) == 0:
         raise HTTPException(status_code=400, detail="No images provided")
 
     # Get all stored embeddings for this student
-    stored_embeddings = db.query(FaceEmbedding).filter(FaceEmbedding.student_id == student_id
-    ).all()
+    stored_embeddings = (await db.scalars(
+        select(FaceEmbedding).where(FaceEmbedding.student_id == student_id)
+    )).all()
     if not stored_embeddings:
         raise HTTPException(status_code=404, detail="No embeddings found for this student")
 
@@ -92,8 +94,7 @@ async def sign_document(
         student_id=student_id
     )
     db.add(new_signature)
-    db.commit()
-    db.refresh(new_signature)
+    await db.commit()
 
     # Optionally, save the verified image for auditing
     return JSONResponse({
@@ -1,16 +1,19 @@
-from fastapi import APIRouter,Request
+from fastapi import APIRouter,Request,HTTPException
 from fastapi.responses import StreamingResponse
 import asyncio
 from datetime import datetime
 from typing import Dict, List
 import json
 from fastapi.encoders import jsonable_encoder
+from utils.auth_utils import get_current_user_from_token
+from utils.inbox import inbox_hub
 
 router = APIRouter()
 
 # Store queues per group
 announcement_subscribers: Dict[int, List[asyncio.Queue]] = {}
 document_subscribers: Dict[int, List[asyncio.Queue]] = {}
+unread_subscribers: Dict[int, List[asyncio.Queue]] = {}
 
 async def broadcast_announcement(group_id: int, announcement: dict):
     """Send new announcement to all connected clients in a group"""
@@ -47,6 +50,18 @@ async def broadcast_announcement_delete(group_id: int, announcement_id: str):
     for queue in announcement_subscribers.get(group_id, []):
         await queue.put(json.dumps(data))
 
+async def broadcast_unread(group_id: int, channel: str, item_id: int, sender: dict = None):
+    """Tell a group that a channel has a new item, so clients can bump their unread counts"""
+    data = {
+        "type": "unread",
+        "group_id": group_id,
+        "channel": channel,
+        "item_id": item_id,
+        "sender": sender,
+    }
+    for queue in unread_subscribers.get(group_id, []):
+        await queue.put(json.dumps(data))
+
 @router.get("/events/announcements/{group_id}")
 async def announcements_sse(group_id: int):
     queue = asyncio.Queue()
@@ -82,3 +97,40 @@ async def documents_sse(group_id: int):
 
     return StreamingResponse(generator(), media_type="text/event-stream")
 
+
+@router.get("/events/unread/{group_id}")
+async def unread_sse(group_id: int):
+    queue = asyncio.Queue()
+    if group_id not in unread_subscribers:
+        unread_subscribers[group_id] = []
+    unread_subscribers[group_id].append(queue)
+
+    async def generator():
+        try:
+            while True:
+                data = await queue.get()  # Wait for a new item in any channel
+                yield f"data: {data}\n\n"
+        except asyncio.CancelledError:
+            unread_subscribers[group_id].remove(queue)
+
+    return StreamingResponse(generator(), media_type="text/event-stream")
+
+
+@router.get("/events/inbox")
+async def inbox_sse(token: str):
+    """New in-app notifications for the signed-in user (EventSource cannot send headers, so the token is a query parameter)"""
+    try:
+        user = get_current_user_from_token(token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    queue = inbox_hub.subscribe(user["role"], user["id"])
+
+    async def generator():
+        try:
+            while True:
+                data = await queue.get()  # Wait for a new notification
+                yield f"data: {data}\n\n"
+        except asyncio.CancelledError:
+            inbox_hub.unsubscribe(user["role"], user["id"], queue)
+
+    return StreamingResponse(generator(), media_type="text/event-stream")
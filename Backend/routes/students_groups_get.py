@@ -1,28 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException,Query
+from fastapi import APIRouter, Depends, HTTPException,Query,Response
+from typing import Literal, Optional
+from datetime import datetime
+from sqlalchemy import and_, func, tuple_
 from sqlalchemy.orm import Session
 from db import get_db
-from models import DoubtClarification, StudyMaterial, Event, Document, Lecturer, Student,LecturerGroup,RecipientRole
+from models import DoubtClarification, StudyMaterial, Event, Document, DocumentSignature, Lecturer, Student,LecturerGroup
 from utils.auth_utils import get_current_user
+from utils.chat_cache import recent_messages, recent_page, encode_cursor, decode_cursor, thread_page
 
 router = APIRouter()
 
-# -----------------------------
-# Get Group Messages. works for both student and lecturer
-# -----------------------------
-@router.get("/messages")
-def get_group_messages(
-    group_id: int = Query(...),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
-):
-    # Determine if user is a student or lecturer
-    student = db.query(Student).filter(Student.student_id == current_user["id"]).first()
-    if student:
+def ensure_group_access(db: Session, current_user: dict, group_id: int):
+    # Student and lecturer ids are separate sequences, so go by the token's role
+    if current_user["role"] == "student":
+        student = db.query(Student).filter(Student.student_id == current_user["id"]).first()
+        if not student:
+            raise HTTPException(status_code=404, detail="User not found")
         # Student can only fetch their own group
         if student.group_id != group_id:
             raise HTTPException(status_code=403, detail="Access denied to this group")
-    else:
-        # Assume lecturer
+    elif current_user["role"] == "lecturer":
         lecturer = db.query(Lecturer).filter(Lecturer.lecturer_id == current_user["id"]).first()
         if not lecturer:
             raise HTTPException(status_code=404, detail="User not found")
@@ -34,38 +31,71 @@ def get_group_messages(
         ).first()
         if not lecturer_group:
             raise HTTPException(status_code=403, detail="Access denied to this group")
+    else:
+        raise HTTPException(status_code=403, detail="Access denied to this group")
+
+
+# -----------------------------
+# Get Group Messages. works for both student and lecturer
+# -----------------------------
+@router.get("/messages")
+def get_group_messages(
+    response: Response,
+    group_id: int = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    ensure_group_access(db, current_user, group_id)
+
+    # Without limit or cursor, the whole history as before (the frontend does not page yet)
+    if limit is None and cursor is None:
+        return recent_page(db, group_id, None)
 
-    doubts = db.query(DoubtClarification).filter(
-    DoubtClarification.group_id == group_id
-).order_by(DoubtClarification.created_at).all()
-
-    messages = []
-
-    for d in doubts:
-        
-        sender_name = "Unknown"
-
-        if d.sender_role == RecipientRole.student:
-            sender = db.query(Student).filter(Student.student_id == d.sender_id).first()
-            
-            if sender:
-                sender_name = sender.name
-        elif d.sender_role == RecipientRole.lecturer:
-            sender = db.query(Lecturer).filter(Lecturer.lecturer_id == d.sender_id).first()
-            
-            if sender:
-                sender_name = sender.name
-
-        messages.append({
-            "doubt_id": d.doubt_id,
-            "sender_name": sender_name,
-            "message": d.message,
-            "sender_id": d.sender_id,
-            "sender_role": d.sender_role.value if hasattr(d.sender_role, 'value') else d.sender_role,
-            "created_at": d.created_at,
-            "reply_to": d.parent_doubt_id
-        })
+    # Keyset pagination, newest page first. Pass X-Next-Cursor back as `cursor` for older messages.
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if before is not None and len(before) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    messages, has_more = recent_messages.page(db, group_id, limit or 50, before)
+    if has_more and messages:
+        response.headers["X-Next-Cursor"] = encode_cursor(messages[0])
+    return messages
+
+
+# -----------------------------
+# Get a message and its reply tree. works for both student and lecturer
+# -----------------------------
+@router.get("/messages/{doubt_id}/thread")
+def get_message_thread(
+    doubt_id: int,
+    response: Response,
+    max_depth: int = Query(10, ge=0, le=50),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    root = db.query(DoubtClarification.group_id).filter(DoubtClarification.doubt_id == doubt_id).first()
+    if not root:
+        raise HTTPException(status_code=404, detail="Message not found")
+    ensure_group_access(db, current_user, root.group_id)
+
+    # Breadth-first pages; pass X-Next-Cursor back as `cursor` for the next page
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after is not None and len(after) != 3:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    messages, has_more = thread_page(db, doubt_id, max_depth, limit, after)
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(messages[-1], with_depth=True)
     return messages
 
 
@@ -167,3 +197,80 @@ def get_student_group_documents(
     ]
 
     return {"documents": documents_list}
+
+
+# -----------------------------
+# Get the current student's documents with their own signing status
+# -----------------------------
+@router.get("/documents/status")
+def get_my_document_status(
+    response: Response,
+    status: Optional[Literal["pending", "overdue", "signed"]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user["role"] != "student":
+        raise HTTPException(status_code=403, detail="Only students can access documents.")
+
+    # One query: the student's group documents, each LEFT JOINed to this
+    # student's own signature only (served by ix_document_signatures_document_student).
+    # Nearest deadline first; pass X-Next-Cursor back as `cursor` for the next page.
+    now = datetime.now()
+    query = (
+        db.query(
+            Document.document_id,
+            Document.title,
+            Document.file_name,
+            Document.file_path,
+            Document.deadline,
+            Document.uploaded_at,
+            Document.uploaded_by,
+            func.coalesce(Lecturer.name, "Lecturer").label("author_name"),
+            DocumentSignature.signature_id,
+            DocumentSignature.signed_at,
+        )
+        .select_from(Student)
+        .join(Document, Document.group_id == Student.group_id)
+        .outerjoin(Lecturer, Lecturer.lecturer_id == Document.uploaded_by)
+        .outerjoin(DocumentSignature, and_(
+            DocumentSignature.document_id == Document.document_id,
+            DocumentSignature.student_id == Student.student_id
+        ))
+        .filter(Student.student_id == current_user["id"])
+    )
+    if status == "signed":
+        query = query.filter(DocumentSignature.signature_id.isnot(None))
+    elif status == "pending":
+        query = query.filter(DocumentSignature.signature_id.is_(None), Document.deadline >= now)
+    elif status == "overdue":
+        query = query.filter(DocumentSignature.signature_id.is_(None), Document.deadline < now)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after is not None and len(after) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after is not None:
+        query = query.filter(tuple_(Document.deadline, Document.document_id) > after)
+    rows = query.order_by(Document.deadline, Document.document_id).limit(limit + 1).all()
+
+    documents = [
+        {
+            "document_id": row.document_id,
+            "title": row.title,
+            "author_name": row.author_name,
+            "file_name": row.file_name,
+            "file_url": row.file_path,
+            "deadline": row.deadline,
+            "uploaded_at": row.uploaded_at,
+            "uploaded_by": row.uploaded_by,
+            "status": "signed" if row.signature_id else ("overdue" if row.deadline < now else "pending"),
+            "signed_at": row.signed_at
+        }
+        for row in rows[:limit]
+    ]
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1], keys=("deadline", "document_id"))
+    return documents
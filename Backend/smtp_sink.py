@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for SDMIT Nexus benchmarks
+Accepts and discards mail on 127.0.0.1 so the notification paths can be
+measured without sending real email. Latency and failure rate are
+configurable to mimic a remote provider.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, connect_latency=0.0, failure_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency                  # seconds added to every reply, like a network round trip
+        self.connect_latency = connect_latency  # seconds before the greeting, like TCP + TLS setup
+        self.failure_rate = failure_rate        # share of RCPT TO commands rejected with 550
+        self.random = random.Random(seed)
+        self.messages = []                      # (received_at, mail_from, recipients, data)
+        self.stats = {"connections": 0, "logins": 0, "messages": 0, "recipients": 0, "rejected": 0}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._writers = set()
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+
+    async def _shutdown(self):
+        # End open client sessions while the loop still runs, so none is left pending
+        self._server.close()
+        sessions = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for writer in list(self._writers):
+            writer.close()
+        if sessions:
+            await asyncio.wait(sessions, timeout=2)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------
+    # SMTP session
+    # ------------------------------
+    async def _reply(self, writer, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write((line + "\r\n").encode())
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        self._writers.add(writer)
+        if self.connect_latency:
+            await asyncio.sleep(self.connect_latency)
+        await self._reply(writer, "220 sdmit-sink ESMTP")
+        mail_from, recipients = None, []
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                command = line[:4].upper()
+
+                if command == "EHLO":
+                    await self._reply(writer, "250-sdmit-sink\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 10485760")
+                elif command == "HELO":
+                    await self._reply(writer, "250 sdmit-sink")
+                elif command == "AUTH":
+                    parts = line.split()
+                    if parts[1].upper() == "LOGIN":
+                        for prompt in ("334 VXNlcm5hbWU6", "334 UGFzc3dvcmQ6"):
+                            await self._reply(writer, prompt)
+                            await reader.readline()
+                    elif len(parts) == 2:
+                        await self._reply(writer, "334 ")
+                        await reader.readline()
+                    self.stats["logins"] += 1
+                    await self._reply(writer, "235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    mail_from, recipients = line[10:].strip(), []
+                    await self._reply(writer, "250 2.1.0 OK")
+                elif command == "RCPT":
+                    if self.failure_rate and self.random.random() < self.failure_rate:
+                        self.stats["rejected"] += 1
+                        await self._reply(writer, "550 5.1.1 No such user")
+                    else:
+                        recipients.append(line[8:].strip())
+                        await self._reply(writer, "250 2.1.5 OK")
+                elif command == "DATA":
+                    await self._reply(writer, "354 End data with <CR><LF>.<CR><LF>")
+                    chunks = []
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line == b".\r\n":
+                            break
+                        chunks.append(data_line)
+                    self.messages.append((time.time(), mail_from, recipients, b"".join(chunks)))
+                    self.stats["messages"] += 1
+                    self.stats["recipients"] += len(recipients)
+                    await self._reply(writer, "250 2.0.0 Queued")
+                elif command in ("RSET", "NOOP"):
+                    mail_from, recipients = (None, []) if command == "RSET" else (mail_from, recipients)
+                    await self._reply(writer, "250 2.0.0 OK")
+                elif command == "QUIT":
+                    await self._reply(writer, "221 2.0.0 Bye")
+                    break
+                else:
+                    await self._reply(writer, "502 5.5.2 Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(port=args.port, latency=args.latency, connect_latency=args.connect_latency,
+                    failure_rate=args.failure_rate).start()
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(sink.stats)
+    except KeyboardInterrupt:
+        sink.stop()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Chat connection pool test for SDMIT Nexus
+Opens hundreds of concurrent group chat WebSockets and checks that idle
+sockets do not hold connections from the async pool they query through,
+so async endpoints sharing that pool keep working
+"""
+
+import sys
+import os
+import time
+from contextlib import ExitStack
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from db import engine, async_engine, SessionLocal, AsyncSessionLocal
+import models
+from models import Group, Student, DoubtClarification
+from routes import chats
+from utils.auth_utils import create_access_token
+
+SOCKETS = 300
+
+
+def seed_group():
+    db = SessionLocal()
+    try:
+        group = Group(branch="POOLTEST", year="0", group_name="POOLTEST-0")
+        db.add(group)
+        db.commit()
+        student = Student(
+            name="Pool Tester",
+            usn="POOLTEST000",
+            email="pooltest@sdmit.in",
+            password_hash="-",
+            branch="POOLTEST",
+            year="0",
+            group_id=group.group_id
+        )
+        db.add(student)
+        db.commit()
+        return group.group_id, student.student_id
+    finally:
+        db.close()
+
+
+def cleanup(group_id: int):
+    db = SessionLocal()
+    try:
+        db.query(DoubtClarification).filter(DoubtClarification.group_id == group_id).delete()
+        db.query(Student).filter(Student.group_id == group_id).delete()
+        db.query(Group).filter(Group.group_id == group_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def ping():
+    """An unrelated async endpoint drawing from the same pool as the chat sockets"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT 1"))
+    return {"ok": True}
+
+
+def test_chat_pool():
+    print(f"Testing {SOCKETS} concurrent chat sockets against the connection pool")
+    print("=" * 50)
+    models.Base.metadata.create_all(bind=engine)
+
+    app = FastAPI()
+    app.include_router(chats.router, prefix="/chats")
+    app.get("/ping")(ping)
+
+    group_id, student_id = seed_group()
+    token = create_access_token({"sub": "pooltest@sdmit.in", "role": "student", "id": student_id})
+    pool_capacity = async_engine.pool.size() + async_engine.pool._max_overflow
+    passed = True
+
+    try:
+        with TestClient(app) as client, ExitStack() as stack:
+            sockets = []
+            start = time.perf_counter()
+            for _ in range(SOCKETS):
+                ws = stack.enter_context(
+                    client.websocket_connect(f"/chats/ws/group/{group_id}?token={token}")
+                )
+                ws.receive_json()  # own "joined" status
+                sockets.append(ws)
+            print(f"Opened {len(sockets)} sockets in {time.perf_counter() - start:.2f}s "
+                  f"(pool capacity {pool_capacity})")
+
+            # 1: idle sockets must not be holding connections
+            checked_out = async_engine.pool.checkedout()
+            print(f"Connections checked out while idle: {checked_out}")
+            if checked_out != 0:
+                print("❌ Idle chat sockets are holding pool connections")
+                passed = False
+
+            # 2: an unrelated request must still get a connection promptly
+            start = time.perf_counter()
+            client.get("/ping").raise_for_status()
+            waited = time.perf_counter() - start
+            print(f"Unrelated checkout took {waited * 1000:.1f} ms")
+            if waited > 1:
+                print("❌ Pool starved by chat sockets")
+                passed = False
+
+            # 3: sockets keep working, and connections are returned afterwards
+            sockets[0].send_json({"action": "send", "message": "pool test"})
+            reply = sockets[0].receive_json()
+            while reply.get("type") != "message":
+                reply = sockets[0].receive_json()
+            print(f"Message stored as doubt {reply['doubt_id']}")
+            # The batch writer inserts through the sync pool
+            checked_out = async_engine.pool.checkedout() + engine.pool.checkedout()
+            if checked_out != 0:
+                print(f"❌ {checked_out} connections still checked out after send")
+                passed = False
+    finally:
+        cleanup(group_id)
+
+    print("✅ Chat pool test passed" if passed else "❌ Chat pool test failed")
+    print("=" * 50)
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_chat_pool() else 1)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Outbox send test for SDMIT Nexus
+Feeds claimed outbox rows straight into the dispatcher's send step, against
+a local SMTP sink, and checks that every leased row comes back with a
+delivery result, including rows whose emails render to identical text,
+and that replies to deleted messages are not merged into one digest
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+# Add the Backend directory to the path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models import NotificationType
+from smtp_sink import SMTPSink
+from utils import smtp_pool
+from utils.mail_scheduler import mail_scheduler, TokenBucket
+from utils.email_notifications import email_service
+from utils.notification_outbox import notification_dispatcher
+
+
+def row(notification_id: int, email: str, thread_id: Optional[int]):
+    """A claimed reply notification, as claim_batch returns it"""
+    return SimpleNamespace(
+        notification_id=notification_id, recipient_email=email, type=NotificationType.doubt_reply,
+        subject="New reply - SDMIT Nexus", message="Asha replied to your message.",
+        item_title="Asha", group_id=1, thread_id=thread_id, attempts=1,
+    )
+
+
+async def test_identical_emails():
+    print("1. Two replies on different threads that render to the same email")
+    batch = [row(1, "bob@sdmit.in", 10), row(2, "bob@sdmit.in", 11), row(3, "carol@sdmit.in", 10)]
+    emails = notification_dispatcher._coalesce(batch)
+    results = await notification_dispatcher._send_all(emails)
+
+    returned = sorted(r.notification_id for rows, _ in results for r in rows)
+    errors = [error for _, error in results if error is not None]
+    print(f"   rows in: [1, 2, 3], rows with a result: {returned}, errors: {errors}")
+    return returned == [1, 2, 3] and not errors
+
+
+def test_deleted_threads():
+    print("2. Two replies whose messages were deleted (thread_id set to NULL)")
+    batch = [
+        row(4, "dave@sdmit.in", None), row(5, "dave@sdmit.in", None),
+        row(6, "dave@sdmit.in", 12), row(7, "dave@sdmit.in", 12),
+    ]
+    emails = sorted(sorted(r.notification_id for r in rows) for rows in notification_dispatcher._coalesce(batch))
+    print(f"   emails: {emails}")
+    return emails == [[4], [5], [6, 7]]
+
+
+async def main():
+    mail_scheduler.per_second = TokenBucket(10_000, 10_000)
+    with SMTPSink() as sink:
+        smtp_pool.SMTP_SERVER, smtp_pool.SMTP_PORT, smtp_pool.SMTP_USE_TLS = "127.0.0.1", sink.port, False
+        try:
+            passed = await test_identical_emails()
+            delivered = sorted(rcpt for _, _, recipients, _ in sink.messages for rcpt in recipients)
+            print(f"   sink received: {delivered}")
+            passed = passed and delivered == ["<bob@sdmit.in>", "<carol@sdmit.in>"]
+            passed = test_deleted_threads() and passed
+        finally:
+            smtp_pool.close_all_pools()
+            email_service.shutdown()
+
+    print("✅ Outbox send test passed" if passed else "❌ Outbox send test failed")
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,267 @@
+from typing import Dict, List, Optional
+from collections import deque
+from datetime import datetime
+from sqlalchemy import and_, case, delete, func, literal, select, tuple_
+from sqlalchemy.orm import Session, aliased
+from models import DoubtClarification, Student, Lecturer, RecipientRole
+import base64
+import threading
+import uuid
+
+RECENT_MESSAGES = 100   # messages kept in memory per chat group
+CHAT_CHANNEL = "chat_messages"   # NOTIFY channel: a group's history changed in some worker
+WORKER_ID = uuid.uuid4().hex     # tells this process's own notifications apart from other workers'
+
+
+def encode_cursor(row: dict, with_depth: bool = False, keys: tuple = ("created_at", "doubt_id")) -> str:
+    """Opaque keyset cursor for a (timestamp, id) ordering; `keys` names the row's two fields"""
+    timestamp, row_id = keys
+    raw = f"{row[timestamp].isoformat()}|{row[row_id]}"
+    if with_depth:
+        raw = f"{row['depth']}|{raw}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Turn an opaque cursor back into its keyset key. Raises ValueError."""
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(parts) == 3:
+            return int(parts[0]), datetime.fromisoformat(parts[1]), int(parts[2])
+        created_at, doubt_id = parts
+        return datetime.fromisoformat(created_at), int(doubt_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def message_key(message: dict) -> tuple:
+    return message["created_at"], message["doubt_id"]
+
+
+def message_query(db: Session, *extra_columns):
+    """Chat message columns with the sender's name resolved by role-conditional outer joins"""
+    sender_name = func.coalesce(
+        case(
+            (DoubtClarification.sender_role == RecipientRole.student, Student.name),
+            (DoubtClarification.sender_role == RecipientRole.lecturer, Lecturer.name),
+        ),
+        "Unknown"
+    ).label("sender_name")
+
+    return (
+        db.query(
+            DoubtClarification.doubt_id,
+            sender_name,
+            DoubtClarification.message,
+            DoubtClarification.sender_id,
+            DoubtClarification.sender_role,
+            DoubtClarification.created_at,
+            DoubtClarification.parent_doubt_id,
+            *extra_columns
+        )
+        .outerjoin(Student, and_(
+            DoubtClarification.sender_role == RecipientRole.student,
+            Student.student_id == DoubtClarification.sender_id
+        ))
+        .outerjoin(Lecturer, and_(
+            DoubtClarification.sender_role == RecipientRole.lecturer,
+            Lecturer.lecturer_id == DoubtClarification.sender_id
+        ))
+    )
+
+
+def row_to_message(r) -> dict:
+    return {
+        "doubt_id": r.doubt_id,
+        "sender_name": r.sender_name,
+        "message": r.message,
+        "sender_id": r.sender_id,
+        "sender_role": r.sender_role.value if hasattr(r.sender_role, 'value') else r.sender_role,
+        "created_at": r.created_at,
+        "reply_to": r.parent_doubt_id
+    }
+
+
+def recent_page(db: Session, group_id: int, limit: Optional[int], before: Optional[tuple] = None) -> List[dict]:
+    """Newest `limit` messages older than `before` (all of them if limit is None), returned oldest first.
+
+    The (group_id, created_at, doubt_id) index serves both the filter and
+    the ordering.
+    """
+    query = message_query(db).filter(DoubtClarification.group_id == group_id)
+    if before is not None:
+        query = query.filter(tuple_(DoubtClarification.created_at, DoubtClarification.doubt_id) < before)
+
+    rows = (
+        query.order_by(DoubtClarification.created_at.desc(), DoubtClarification.doubt_id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [row_to_message(r) for r in reversed(rows)]
+
+
+def thread_ids(root_filter, max_depth: Optional[int] = None):
+    """Recursive CTE of (doubt_id, depth) for a root doubt and all of its replies"""
+    thread = (
+        select(DoubtClarification.doubt_id, literal(0).label("depth"))
+        .where(root_filter)
+        .cte("thread", recursive=True)
+    )
+    reply = aliased(DoubtClarification)
+    step = select(reply.doubt_id, thread.c.depth + 1).where(reply.parent_doubt_id == thread.c.doubt_id)
+    if max_depth is not None:
+        step = step.where(thread.c.depth < max_depth)
+    return thread.union_all(step)
+
+
+def thread_page(db: Session, root_id: int, max_depth: int, limit: int, after: Optional[tuple] = None):
+    """A doubt and its reply tree in one round trip, breadth first.
+
+    Pages on (depth, created_at, doubt_id). Returns (messages, has_more).
+    """
+    thread = thread_ids(DoubtClarification.doubt_id == root_id, max_depth)
+    query = (
+        message_query(db, thread.c.depth)
+        .join(thread, thread.c.doubt_id == DoubtClarification.doubt_id)
+    )
+    if after is not None:
+        query = query.filter(tuple_(thread.c.depth, DoubtClarification.created_at, DoubtClarification.doubt_id) > after)
+
+    rows = (
+        query.order_by(thread.c.depth, DoubtClarification.created_at, DoubtClarification.doubt_id)
+        .limit(limit + 1)
+        .all()
+    )
+    messages = [{**row_to_message(r), "depth": r.depth} for r in rows[:limit]]
+    return messages, len(rows) > limit
+
+
+def notify_changed(db: Session, group_ids):
+    """Tell the other workers to drop their cached history; sent when the transaction commits"""
+    for group_id in sorted(set(group_ids)):
+        db.execute(select(func.pg_notify(CHAT_CHANNEL, f"{WORKER_ID}:{group_id}")))
+
+
+def delete_thread(db: Session, root_id: int, sender_id: int, sender_role: str) -> List[int]:
+    """Delete a sender's own doubt and every reply under it in one statement.
+
+    Returns the deleted ids, or an empty list if the doubt is not theirs.
+    """
+    thread = thread_ids(and_(
+        DoubtClarification.doubt_id == root_id,
+        DoubtClarification.sender_id == sender_id,
+        DoubtClarification.sender_role == sender_role
+    ))
+    result = db.execute(
+        delete(DoubtClarification)
+        .where(DoubtClarification.doubt_id.in_(select(thread.c.doubt_id)))
+        .returning(DoubtClarification.doubt_id, DoubtClarification.group_id)
+    )
+    rows = result.all()
+    deleted = [row.doubt_id for row in rows]
+    notify_changed(db, [row.group_id for row in rows])
+    db.commit()
+    return deleted
+
+
+class RecentMessageCache:
+    """Per-worker ring of each group's recent messages; other workers' writes invalidate it"""
+
+    def __init__(self, size: int = RECENT_MESSAGES):
+        self.size = size
+        self.groups: Dict[int, deque] = {}
+        # True while the ring still holds the group's entire history
+        self.complete: Dict[int, bool] = {}
+        # Messages written while a group is being loaded from the database
+        self.warming: Dict[int, list] = {}
+        # Bumped by invalidate(); a load that raced an invalidation is not kept
+        self.generation: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self, db: Session, group_id: int) -> List[dict]:
+        with self.lock:
+            if group_id in self.groups:
+                return list(self.groups[group_id])
+            self.warming.setdefault(group_id, [])
+            generation = self.generation.get(group_id, 0)
+
+        try:
+            loaded = recent_page(db, group_id, self.size + 1)
+        finally:
+            with self.lock:
+                late = self.warming.pop(group_id, [])
+        complete = len(loaded) <= self.size
+        messages = loaded[-self.size:]
+        seen = {m["doubt_id"] for m in messages}
+        messages += [m for m in late if m["doubt_id"] not in seen]
+
+        with self.lock:
+            if group_id in self.groups:
+                return list(self.groups[group_id])
+            if self.generation.get(group_id, 0) != generation:
+                # Another worker changed the group mid-load: serve this load, don't cache it
+                return messages[-self.size:]
+            self.groups[group_id] = deque(messages, maxlen=self.size)
+            self.complete[group_id] = complete and len(messages) <= self.size
+            return list(self.groups[group_id])
+
+    def invalidate(self, group_id: Optional[int] = None):
+        """Forget a group's ring (or every ring); the next read reloads it from the database"""
+        with self.lock:
+            group_ids = list(self.groups) + list(self.warming) if group_id is None else [group_id]
+            for gid in group_ids:
+                self.groups.pop(gid, None)
+                self.complete.pop(gid, None)
+                self.generation[gid] = self.generation.get(gid, 0) + 1
+
+    def on_notify(self, payload: str):
+        """pg_listener handler for CHAT_CHANNEL"""
+        worker, group_id = payload.split(":")
+        if worker != WORKER_ID:
+            self.invalidate(int(group_id))
+
+    def is_complete(self, group_id: int) -> bool:
+        with self.lock:
+            return self.complete.get(group_id, False)
+
+    def append(self, group_id: int, message: dict):
+        with self.lock:
+            if group_id in self.warming:
+                self.warming[group_id].append(message)
+            ring = self.groups.get(group_id)
+            if ring is None:
+                return
+            if len(ring) == ring.maxlen:
+                self.complete[group_id] = False
+            ring.append(message)
+
+    def remove(self, group_id: int, doubt_ids: List[int]):
+        with self.lock:
+            ring = self.groups.get(group_id)
+            if ring is None:
+                return
+            removed = set(doubt_ids)
+            self.groups[group_id] = deque(
+                (m for m in ring if m["doubt_id"] not in removed), maxlen=self.size
+            )
+
+    def page(self, db: Session, group_id: int, limit: int, before: Optional[tuple] = None):
+        """One page of history, oldest first, plus whether older messages exist.
+
+        Served from the ring when it covers the page, otherwise from the database.
+        """
+        snapshot = self.snapshot(db, group_id)
+        complete = self.is_complete(group_id)
+        candidates = snapshot if before is None else [m for m in snapshot if message_key(m) < before]
+
+        if len(candidates) >= limit:
+            return candidates[-limit:], len(candidates) > limit or not complete
+        if complete:
+            return candidates, False
+
+        rows = recent_page(db, group_id, limit + 1, before)
+        return rows[-limit:], len(rows) > limit
+
+
+# Global instance
+recent_messages = RecentMessageCache()
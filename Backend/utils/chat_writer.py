@@ -0,0 +1,144 @@
+from typing import List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from db import SessionLocal
+from models import DoubtClarification
+from utils.notification_outbox import enqueue_replies, notification_dispatcher
+from utils.inbox import inbox_hub
+from utils.chat_cache import notify_changed
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW_MS = 5     # how long the first message of a batch waits for company
+MAX_BATCH_SIZE = 500    # flush early once this many messages are waiting
+
+
+def insert_messages(rows: List[dict], sender_names: Optional[List[str]] = None) -> List[Tuple[int, object]]:
+    """One INSERT ... RETURNING and one commit, with the batch's reply notifications and cache NOTIFY.
+    Returns (doubt_id, created_at) per row, in row order.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            insert(DoubtClarification).returning(
+                DoubtClarification.doubt_id,
+                DoubtClarification.created_at,
+                sort_by_parameter_order=True
+            ),
+            rows
+        )
+        created = [(r.doubt_id, r.created_at) for r in result]
+
+        names = sender_names or [None] * len(rows)
+        replies = [
+            {
+                "parent_id": row["parent_doubt_id"],
+                "group_id": row["group_id"],
+                "sender_id": row["sender_id"],
+                "sender_role": row["sender_role"],
+                "sender_name": name or "Someone"
+            }
+            for row, name in zip(rows, names) if row["parent_doubt_id"] is not None
+        ]
+        notifications = enqueue_replies(db, replies)
+        notify_changed(db, [row["group_id"] for row in rows])
+        db.commit()
+        if notifications:
+            notification_dispatcher.wake()
+            inbox_hub.publish(notifications)
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+class ChatWriteBatcher:
+    """Group-commits chat messages from every socket in the process.
+
+    Senders await write() and get back their own doubt_id and created_at,
+    while the database sees one INSERT and one commit per batch.
+    """
+
+    def __init__(self, window_ms: int = BATCH_WINDOW_MS, max_batch: int = MAX_BATCH_SIZE):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def write(self, group_id: int, sender_id: int, sender_role: str, message: str, parent_id=None,
+                    sender_name: Optional[str] = None) -> dict:
+        if self._task is None or self._task.done():
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+        row = {
+            "group_id": group_id,
+            "sender_id": sender_id,
+            "sender_role": sender_role,
+            "message": message,
+            "parent_doubt_id": parent_id,
+        }
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, sender_name, future))
+        doubt_id, created_at = await future
+        return {
+            "doubt_id": doubt_id,
+            "message": message,
+            "sender_id": sender_id,
+            "sender_role": sender_role,
+            "created_at": created_at,
+            "reply_to": parent_id
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        rows = [row for row, _, _ in batch]
+        names = [name for _, name, _ in batch]
+        try:
+            created = await run_in_threadpool(insert_messages, rows, names)
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][2], exc=e)
+                return
+            # One bad row (e.g. a stale parent_id) must not fail everyone else's message
+            logger.warning(f"Chat batch of {len(batch)} failed, retrying rows one by one: {e}")
+            for row, name, future in batch:
+                try:
+                    created_one = await run_in_threadpool(insert_messages, [row], [name])
+                    self._resolve(future, result=created_one[0])
+                except Exception as row_error:
+                    self._resolve(future, exc=row_error)
+            return
+        for (_, _, future), result in zip(batch, created):
+            self._resolve(future, result=result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result=None, exc: Exception = None):
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+
+# Global instance
+chat_writer = ChatWriteBatcher()
@@ -0,0 +1,165 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+from sqlalchemy import Integer, String, column, delete, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from db import SessionLocal
+from models import DeadlineReminder, Document, ReminderStatus, Student, Notification, NotificationType, RecipientRole
+from utils.email_notifications import email_service, not_signed
+from utils.notification_outbox import delivery_state
+from utils.inbox import INBOX_RETURNING, inbox_hub
+import logging
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY channel that tells the scheduler leader about new due times
+REMINDER_CHANNEL = "deadline_reminders"
+
+
+def save_reminders(document_id: int, stages: Dict[int, datetime]):
+    """Persist one reminder per stage (minutes before -> due time) in one statement.
+
+    Rescheduling the same document moves its stages. The due times are
+    NOTIFYed in the same transaction, so whichever worker is the scheduler
+    leader arms the timers once they are committed.
+    """
+    db = SessionLocal()
+    try:
+        stmt = insert(DeadlineReminder).values([
+            {
+                "document_id": document_id,
+                "minutes_before": minutes,
+                "due_at": due_at,
+                "status": ReminderStatus.pending
+            }
+            for minutes, due_at in stages.items()
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            constraint="uq_deadline_reminders_document_stage",
+            set_={"due_at": stmt.excluded.due_at, "status": ReminderStatus.pending, "sent_at": None}
+        ))
+        payload = ",".join(due_at.isoformat() for due_at in stages.values())
+        db.execute(select(func.pg_notify(REMINDER_CHANNEL, payload)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def delete_reminders(document_id: int):
+    db = SessionLocal()
+    try:
+        db.execute(delete(DeadlineReminder).where(
+            DeadlineReminder.document_id == document_id,
+            DeadlineReminder.status == ReminderStatus.pending
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def pending_due_times() -> List[datetime]:
+    """Every distinct due time still pending: the whole startup rehydration in one query"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(DeadlineReminder.due_at)
+            .filter(DeadlineReminder.status == ReminderStatus.pending)
+            .distinct()
+            .all()
+        )
+        return [r.due_at for r in rows]
+    finally:
+        db.close()
+
+
+def enqueue_unsigned(db, rendered: Dict[int, tuple]) -> list:
+    """Notification rows for every unsigned student of every document, in one INSERT ... SELECT.
+
+    `rendered` maps document_id -> (subject, content); the bodies are built
+    once per document and joined in as a VALUES list. Rows follow each
+    student's notification_channel. Returns the inserted rows.
+    """
+    bodies = values(
+        column("document_id", Integer), column("subject", String), column("message", String),
+        name="bodies"
+    ).data([(document_id, subject, content) for document_id, (subject, content) in rendered.items()])
+
+    recipients = (
+        select(
+            Student.student_id,
+            literal(RecipientRole.student, Notification.recipient_role.type),
+            Student.email,
+            Document.group_id,
+            literal(NotificationType.document_reminder, Notification.type.type),
+            Student.notification_channel,
+            *delivery_state(Student.notification_channel),
+            bodies.c.subject,
+            bodies.c.message,
+            Document.title
+        )
+        .select_from(bodies)
+        .join(Document, Document.document_id == bodies.c.document_id)
+        .join(Student, Student.group_id == Document.group_id)
+        .where(Student.email.isnot(None), not_signed(Document.document_id))
+    )
+    return db.execute(insert(Notification).from_select(
+        ["recipient_id", "recipient_role", "recipient_email", "group_id", "type",
+         "channel", "status", "sent_at", "subject", "message", "item_title"],
+        recipients
+    ).returning(*INBOX_RETURNING)).all()
+
+
+def process_due(now: Optional[datetime] = None) -> int:
+    """Turn every due reminder stage, for every document, into outbox emails in one batch.
+
+    Covers both timers that fired on time and stages that came due while
+    the service was down; when several stages of one document are due at
+    once, students get a single reminder. Stages whose deadline has already
+    passed are marked expired instead. Rows are locked with SKIP LOCKED, so
+    overlapping runs never send a stage twice. Returns how many documents
+    were reminded.
+    """
+    now = now or datetime.now()
+    db = SessionLocal()
+    try:
+        due = (
+            db.query(
+                DeadlineReminder.reminder_id,
+                Document.document_id,
+                Document.title,
+                Document.deadline
+            )
+            .join(Document, Document.document_id == DeadlineReminder.document_id)
+            .filter(DeadlineReminder.status == ReminderStatus.pending, DeadlineReminder.due_at <= now)
+            .with_for_update(of=DeadlineReminder, skip_locked=True)
+            .all()
+        )
+
+        sent, expired, rendered, inserted = [], [], {}, []
+        for reminder in due:
+            if reminder.deadline <= now:
+                expired.append(reminder.reminder_id)
+                continue
+            sent.append(reminder.reminder_id)
+            if reminder.document_id not in rendered:
+                rendered[reminder.document_id] = email_service.deadline_message(reminder.title, reminder.deadline)
+
+        if rendered:
+            inserted = enqueue_unsigned(db, rendered)
+        if sent:
+            db.execute(
+                update(DeadlineReminder)
+                .where(DeadlineReminder.reminder_id.in_(sent))
+                .values(status=ReminderStatus.sent, sent_at=now)
+            )
+        if expired:
+            db.execute(
+                update(DeadlineReminder)
+                .where(DeadlineReminder.reminder_id.in_(expired))
+                .values(status=ReminderStatus.expired)
+            )
+            logger.warning(f"{len(expired)} deadline reminders expired while the service was down")
+        db.commit()
+        inbox_hub.publish(inserted)
+        return len(rendered)
+    finally:
+        db.close()
@@ -1,19 +1,24 @@
-import smtplib
 from email.message import EmailMessage
-from sqlalchemy.orm import Session
-from models import Student, Lecturer, Group, DocumentSignature
-from typing import List, Optional
+from sqlalchemy import exists
+from fastapi.concurrency import run_in_threadpool
+from models import Student, DocumentSignature
+from typing import Dict, List, Optional
 import logging
 from datetime import datetime, timedelta
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import sys
 import os
 
 # Add the parent directory to the path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from utils.smtp_pool import get_smtp_pool
+from utils.mail_scheduler import mail_scheduler, MailPriority
+from utils.leader_election import leader_elector
+
 # Import email credentials from existing OTP utils
 try:
     from utils.otp_utils import FROM_EMAIL, APP_PASSWORD
@@ -29,7 +34,8 @@ except ImportError:
 try:
     from config.email_config import (
         EMAIL_TEMPLATES, SMTP_SERVER, SMTP_PORT, 
-        SMTP_TIMEOUT, DEADLINE_REMINDER_MINUTES
+        SMTP_TIMEOUT, DEADLINE_REMINDER_MINUTES, DEADLINE_REMINDER_STAGES,
+        BULK_SEND_ENABLED, BULK_BCC_CHUNK_SIZE, MAINTENANCE_INTERVAL_MINUTES
     )
 except ImportError:
     # Fallback configuration if config file doesn't exist
@@ -38,37 +44,138 @@ except ImportError:
     SMTP_PORT = 587
     SMTP_TIMEOUT = 15
     DEADLINE_REMINDER_MINUTES = 10
+    DEADLINE_REMINDER_STAGES = [DEADLINE_REMINDER_MINUTES]
+    BULK_SEND_ENABLED = True
+    BULK_BCC_CHUNK_SIZE = 50
+    MAINTENANCE_INTERVAL_MINUTES = 15
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def not_signed(document_id: int):
+    """Student filter: no signature on the document, as an anti-join"""
+    return ~exists().where(
+        DocumentSignature.document_id == document_id,
+        DocumentSignature.student_id == Student.student_id
+    )
+
+
 class EmailNotificationService:
     def __init__(self):
+        # Started by start() on the app's event loop. It only holds jobs while
+        # this worker is the scheduler leader.
         self.scheduler = AsyncIOScheduler()
+
+    async def start(self):
+        """Start the scheduler on the running loop and join the leader election"""
+        from utils.deadline_reminders import REMINDER_CHANNEL
+        self.scheduler.configure(event_loop=asyncio.get_running_loop())
         self.scheduler.start()
-    
+        leader_elector.on_elected = self.become_leader
+        leader_elector.on_demoted = self.step_down
+        leader_elector.listen(REMINDER_CHANNEL, self.on_reminders_saved)
+        leader_elector.start()
+
+    async def become_leader(self):
+        """Restore persisted reminders and take over the maintenance job"""
+        await self.rehydrate_reminders()
+        self.scheduler.add_job(
+            self.run_maintenance,
+            IntervalTrigger(minutes=MAINTENANCE_INTERVAL_MINUTES),
+            id="maintenance",
+            replace_existing=True,
+            misfire_grace_time=None,
+            coalesce=True
+        )
+
+    async def step_down(self):
+        """Another worker owns the timers now"""
+        self.scheduler.remove_all_jobs()
+
+    async def on_reminders_saved(self, payload: str):
+        """NOTIFY from save_reminders on any worker: arm its due times here on the leader"""
+        for value in payload.split(","):
+            self.arm_reminders(datetime.fromisoformat(value))
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown()
+        mail_scheduler.shutdown()
+
+    def deliver(self, to_email: str, subject: str, content: str, bcc: Optional[List[str]] = None) -> dict:
+        """Send a single email, raising on failure so callers can record why.
+
+        With bcc, the message is addressed to our own account and delivered to
+        the bcc addresses through the envelope only, so recipients never see
+        each other. Returns the addresses the server refused, if it took the rest.
+        """
+        if not FROM_EMAIL or not APP_PASSWORD:
+            raise RuntimeError("Email credentials missing. Set FROM_EMAIL and APP_PASSWORD.")
+
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = FROM_EMAIL
+        msg["To"] = to_email
+        msg.set_content(content)
+
+        # Reuses an authenticated session from the shared pool
+        return get_smtp_pool(FROM_EMAIL, APP_PASSWORD).send_message(msg, to_addrs=bcc)
+
+    def send_envelope(self, emails: List[str], subject: str, content: str) -> Dict[str, Optional[Exception]]:
+        """One SMTP transaction for all emails, falling back to one message each for any it could not take.
+
+        Returns the outcome per address: None when delivered, else the error.
+        """
+        if len(emails) == 1:
+            failed = emails
+            outcome = {}
+        else:
+            try:
+                failed = list(self.deliver(FROM_EMAIL, subject, content, bcc=emails))
+            except Exception as e:
+                # Nothing was accepted, e.g. every recipient refused or the message rejected
+                logger.warning(f"Bulk send to {len(emails)} recipients failed, sending one by one: {e}")
+                failed = emails
+            outcome = {email: None for email in emails if email not in failed}
+
+        for email in failed:
+            try:
+                self.deliver(email, subject, content)
+                outcome[email] = None
+            except Exception as e:
+                outcome[email] = e
+        return outcome
+
+    async def send_bulk_async(self, emails: List[str], subject: str, content: str,
+                              priority: MailPriority = MailPriority.bulk) -> Dict[str, Optional[Exception]]:
+        """Send one identical email to many addresses, BULK_BCC_CHUNK_SIZE per SMTP transaction.
+
+        Chunks are queued on the mail scheduler, charged one token per
+        recipient. With BULK_SEND_ENABLED off, every address gets its own message.
+        """
+        size = BULK_BCC_CHUNK_SIZE if BULK_SEND_ENABLED else 1
+        chunks = [emails[i:i + size] for i in range(0, len(emails), size)]
+        results = await asyncio.gather(*(
+            asyncio.wrap_future(mail_scheduler.submit(
+                priority, self.send_envelope, chunk, subject, content, cost=len(chunk)
+            ))
+            for chunk in chunks
+        ), return_exceptions=True)
+        outcome = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                # The chunk never ran, e.g. rate limited; every address shares the error
+                outcome.update({email: result for email in chunk})
+            else:
+                outcome.update(result)
+        return outcome
+
     def send_email(self, to_email: str, subject: str, content: str) -> bool:
         """Send a single email notification"""
         try:
-            if not FROM_EMAIL or not APP_PASSWORD:
-                logger.error("Email credentials missing. Set FROM_EMAIL and APP_PASSWORD.")
-                return False
-
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(FROM_EMAIL, APP_PASSWORD)
-
-            msg = EmailMessage()
-            msg["Subject"] = subject
-            msg["From"] = FROM_EMAIL
-            msg["To"] = to_email
-            msg.set_content(content)
-
-            server.send_message(msg)
-            server.quit()
+            self.deliver(to_email, subject, content)
             logger.info(f"Email sent successfully to {to_email}")
             return True
 
@@ -76,20 +183,12 @@ class EmailNotificationService:
             logger.error(f"Failed to send email to {to_email}: {e}")
             return False
 
-    async def send_material_notification(self, db: Session, group_id: int, lecturer_name: str, material_title: str):
-        """Send email notifications to all students in a group when materials are uploaded"""
-        try:
-            # Get all students in the group
-            students = db.query(Student).filter(Student.group_id == group_id).all()
-            
-            if not students:
-                logger.warning(f"No students found in group {group_id}")
-                return
-
-            # Use email template if available
-            template = EMAIL_TEMPLATES.get("material_notification", {})
-            subject = template.get("subject", "New Study Material Available - SDMIT Nexus")
-            content_template = template.get("template", """
+    # ---- Message bodies, shared by direct sends and the outbox ----
+    def material_message(self, lecturer_name: str, material_title: str):
+        """Subject and body of the material notification email"""
+        template = EMAIL_TEMPLATES.get("material_notification", {})
+        subject = template.get("subject", "New Study Material Available - SDMIT Nexus")
+        content_template = template.get("template", """
 Dear Student,
 
 {lecturer_name} has uploaded new materials. Please view them.
@@ -101,34 +200,13 @@ Please log in to SDMIT Nexus to access the new materials.
 Best regards,
 SDMIT Nexus Team
             """)
-            content = content_template.format(
-                lecturer_name=lecturer_name,
-                material_title=material_title
-            )
-
-            # Send emails to all students
-            for student in students:
-                if student.email:
-                    self.send_email(student.email, subject, content)
-                    logger.info(f"Material notification sent to {student.email}")
+        return subject, content_template.format(lecturer_name=lecturer_name, material_title=material_title)
 
-        except Exception as e:
-            logger.error(f"Error sending material notifications: {e}")
-
-    async def send_event_notification(self, db: Session, group_id: int, lecturer_name: str, event_title: str):
-        """Send email notifications to all students in a group when events are announced"""
-        try:
-            # Get all students in the group
-            students = db.query(Student).filter(Student.group_id == group_id).all()
-            
-            if not students:
-                logger.warning(f"No students found in group {group_id}")
-                return
-
-            # Use email template if available
-            template = EMAIL_TEMPLATES.get("event_notification", {})
-            subject = template.get("subject", "New Event Announcement - SDMIT Nexus")
-            content_template = template.get("template", """
+    def event_message(self, lecturer_name: str, event_title: str):
+        """Subject and body of the event notification email"""
+        template = EMAIL_TEMPLATES.get("event_notification", {})
+        subject = template.get("subject", "New Event Announcement - SDMIT Nexus")
+        content_template = template.get("template", """
 Dear Student,
 
 {lecturer_name} has uploaded an event-related announcement.
@@ -140,34 +218,13 @@ Please log in to SDMIT Nexus to view the event details.
 Best regards,
 SDMIT Nexus Team
             """)
-            content = content_template.format(
-                lecturer_name=lecturer_name,
-                event_title=event_title
-            )
-
-            # Send emails to all students
-            for student in students:
-                if student.email:
-                    self.send_email(student.email, subject, content)
-                    logger.info(f"Event notification sent to {student.email}")
+        return subject, content_template.format(lecturer_name=lecturer_name, event_title=event_title)
 
-        except Exception as e:
-            logger.error(f"Error sending event notifications: {e}")
-
-    async def send_document_notification(self, db: Session, group_id: int, lecturer_name: str, document_title: str):
-        """Send email notifications to all students in a group when documents are uploaded for signing"""
-        try:
-            # Get all students in the group
-            students = db.query(Student).filter(Student.group_id == group_id).all()
-            
-            if not students:
-                logger.warning(f"No students found in group {group_id}")
-                return
-
-            # Use email template if available
-            template = EMAIL_TEMPLATES.get("document_notification", {})
-            subject = template.get("subject", "Document Verification Required - SDMIT Nexus")
-            content_template = template.get("template", """
+    def document_message(self, lecturer_name: str, document_title: str):
+        """Subject and body of the document notification email"""
+        template = EMAIL_TEMPLATES.get("document_notification", {})
+        subject = template.get("subject", "Document Verification Required - SDMIT Nexus")
+        content_template = template.get("template", """
 Dear Student,
 
 {lecturer_name} has uploaded a document for verification and signing. Please complete it at the earliest.
@@ -179,63 +236,55 @@ Please log in to SDMIT Nexus to sign the document.
 Best regards,
 SDMIT Nexus Team
             """)
-            content = content_template.format(
-                lecturer_name=lecturer_name,
-                document_title=document_title
-            )
+        return subject, content_template.format(lecturer_name=lecturer_name, document_title=document_title)
 
-            # Send emails to all students
-            for student in students:
-                if student.email:
-                    self.send_email(student.email, subject, content)
-                    logger.info(f"Document notification sent to {student.email}")
+    def reply_message(self, replier_name: str):
+        """Subject and body of the reply notification email"""
+        template = EMAIL_TEMPLATES.get("reply_notification", {})
+        subject = template.get("subject", "New reply to your message in Group Discussion")
+        content_template = template.get("template", """
+Dear User,
 
-        except Exception as e:
-            logger.error(f"Error sending document notifications: {e}")
+{replier_name} has replied to your message. Please check it in the Group Discussion section.
 
-    async def send_deadline_reminder(self, document_id: int):
-        """Send email reminders to students who haven't signed a document 10 minutes before deadline"""
-        try:
-            # Create a new database session for this async operation
-            from db import SessionLocal
-            db = SessionLocal()
-            try:
-                # Get document details
-                from models import Document
-                document = db.query(Document).filter(Document.document_id == document_id).first()
-                
-                if not document:
-                    logger.warning(f"Document {document_id} not found")
-                    return
+Best regards,
+SDMIT Nexus Team
+            """)
+        return subject, content_template.format(replier_name=replier_name)
 
-                # Get lecturer name
-                lecturer = db.query(Lecturer).filter(Lecturer.lecturer_id == document.uploaded_by).first()
-                lecturer_name = lecturer.name if lecturer else "Lecturer"
+    def reply_digest_message(self, replier_names: List[str]):
+        """Subject and body of one email summarising several replies to the same message"""
+        template = EMAIL_TEMPLATES.get("reply_digest_notification", {})
+        subject = template.get("subject", "{count} new replies to your message in Group Discussion")
+        content_template = template.get("template", """
+Dear User,
 
-                # Get all students in the group
-                students = db.query(Student).filter(Student.group_id == document.group_id).all()
-                
-                if not students:
-                    logger.warning(f"No students found in group {document.group_id}")
-                    return
-
-                # Get students who have already signed
-                signed_student_ids = db.query(DocumentSignature.student_id).filter(
-                    DocumentSignature.document_id == document_id
-                ).all()
-                signed_student_ids = [sid[0] for sid in signed_student_ids]
-
-                # Filter students who haven't signed
-                unsigned_students = [s for s in students if s.student_id not in signed_student_ids]
-
-                if not unsigned_students:
-                    logger.info(f"All students have signed document {document_id}")
-                    return
-
-                # Use email template if available
-                template = EMAIL_TEMPLATES.get("deadline_reminder", {})
-                subject = template.get("subject", "Document Deadline Reminder - SDMIT Nexus")
-                content_template = template.get("template", """
+Your message in the Group Discussion has new replies:
+
+{items}
+
+Please check them in the Group Discussion section.
+
+Best regards,
+SDMIT Nexus Team
+            """)
+        counts = {}
+        for name in replier_names:
+            counts[name] = counts.get(name, 0) + 1
+        items = "\n".join(
+            f"- {name} replied {count} times" if count > 1 else f"- {name} replied"
+            for name, count in counts.items()
+        )
+        return (
+            subject.format(count=len(replier_names)),
+            content_template.format(count=len(replier_names), items=items)
+        )
+
+    def deadline_message(self, document_title: str, deadline: datetime):
+        """Subject and body of the deadline reminder email"""
+        template = EMAIL_TEMPLATES.get("deadline_reminder", {})
+        subject = template.get("subject", "Document Deadline Reminder - SDMIT Nexus")
+        content_template = template.get("template", """
 Dear Student,
 
 The document awaiting verification and signing is near its deadline. Please complete it as soon as possible.
@@ -248,107 +297,117 @@ Please log in to SDMIT Nexus to sign the document immediately.
 Best regards,
 SDMIT Nexus Team
                 """)
-                content = content_template.format(
-                    document_title=document.title,
-                    deadline=document.deadline.strftime('%Y-%m-%d %H:%M')
-                )
-
-                # Send emails to unsigned students
-                for student in unsigned_students:
-                    if student.email:
-                        self.send_email(student.email, subject, content)
-                        logger.info(f"Deadline reminder sent to {student.email}")
-            finally:
-                db.close()
+        return subject, content_template.format(
+            document_title=document_title,
+            deadline=deadline.strftime('%Y-%m-%d %H:%M')
+        )
+
+    def digest_message(self, label: str, titles: List[str]):
+        """Subject and body of one email listing several uploads of the same kind"""
+        template = EMAIL_TEMPLATES.get("digest_notification", {})
+        subject = template.get("subject", "{count} new {label} in your group - SDMIT Nexus")
+        content_template = template.get("template", """
+Dear Student,
 
-        except Exception as e:
-            logger.error(f"Error sending deadline reminders: {e}")
+The following {label} were posted in your group:
+
+{items}
+
+Please log in to SDMIT Nexus to view them.
+
+Best regards,
+SDMIT Nexus Team
+            """)
+        items = "\n".join(f"- {title}" for title in titles)
+        return (
+            subject.format(count=len(titles), label=label),
+            content_template.format(count=len(titles), label=label, items=items)
+        )
 
     def schedule_deadline_reminder(self, document_id: int, deadline: datetime):
-        """Schedule a deadline reminder before the deadline"""
+        """Persist a reminder for every stage still ahead of the deadline and arm their timers"""
         try:
-            reminder_time = deadline - timedelta(minutes=DEADLINE_REMINDER_MINUTES)
-            
-            # Only schedule if the reminder time is in the future
-            if reminder_time > datetime.now():
-                self.scheduler.add_job(
-                    self.send_deadline_reminder,
-                    DateTrigger(run_date=reminder_time),
-                    args=[document_id],
-                    id=f"deadline_reminder_{document_id}",
-                    replace_existing=True
-                )
-                logger.info(f"Deadline reminder scheduled for document {document_id} at {reminder_time}")
+            from utils.deadline_reminders import save_reminders
+            now = datetime.now()
+            stages = {
+                minutes: deadline - timedelta(minutes=minutes)
+                for minutes in DEADLINE_REMINDER_STAGES
+                if deadline - timedelta(minutes=minutes) > now
+            }
+
+            # Only schedule stages whose reminder time is in the future; the
+            # leader arms the timers when it receives the saved due times
+            if stages:
+                save_reminders(document_id, stages)
+                logger.info(f"Deadline reminders scheduled for document {document_id} at "
+                            f"{', '.join(str(t) for t in sorted(stages.values()))}")
             else:
                 logger.warning(f"Cannot schedule reminder for document {document_id} - deadline too soon")
                 
         except Exception as e:
             logger.error(f"Error scheduling deadline reminder: {e}")
 
-    def cancel_deadline_reminder(self, document_id: int):
-        """Cancel a scheduled deadline reminder"""
+    def arm_reminders(self, due_at: datetime):
+        """One timer per due time; it processes every reminder due by then, for any document"""
+        if not leader_elector.is_leader:
+            return
+        # A timer that fires late (stalled loop, leader change) still runs rather
+        # than waiting for maintenance; process_due expires stages already past
+        self.scheduler.add_job(
+            self.process_due_reminders,
+            DateTrigger(run_date=due_at),
+            id=f"deadline_reminders_{due_at:%Y%m%d%H%M%S}",
+            replace_existing=True,
+            misfire_grace_time=None,
+            coalesce=True
+        )
+
+    async def process_due_reminders(self):
+        """Queue every due reminder in the outbox and wake the dispatcher"""
         try:
-            job_id = f"deadline_reminder_{document_id}"
-            self.scheduler.remove_job(job_id)
-            logger.info(f"Deadline reminder cancelled for document {document_id}")
+            from utils.deadline_reminders import process_due
+            from utils.notification_outbox import notification_dispatcher
+            queued = await run_in_threadpool(process_due)
+            if queued:
+                notification_dispatcher.wake()
+                logger.info(f"Queued deadline reminders for {queued} documents")
         except Exception as e:
-            logger.error(f"Error cancelling deadline reminder: {e}")
+            logger.error(f"Error processing deadline reminders: {e}")
 
-    def send_reply_notification(self, db: Session, parent_message_id: int, replier_name: str, replier_role: str, replier_id: int):
-        """Send email notification to the original message sender when someone replies"""
+    async def rehydrate_reminders(self):
+        """Re-arm persisted reminders after a restart and catch up on any that came due meanwhile"""
         try:
-            # Get the parent message
-            from models import DoubtClarification
-            parent_message = db.query(DoubtClarification).filter(
-                DoubtClarification.doubt_id == parent_message_id
-            ).first()
-            
-            if not parent_message:
-                logger.warning(f"Parent message {parent_message_id} not found")
-                return
-            
-            # Don't send email if the replier is the same as the original sender
-            if (parent_message.sender_id == replier_id and 
-                parent_message.sender_role.value == replier_role):
-                # This is a self-reply, don't send notification
-                logger.info(f"Skipping reply notification - user replied to their own message")
-                return
-            
-            # Get the original sender's email
-            recipient_email = None
-            if parent_message.sender_role.value == "student":
-                sender = db.query(Student).filter(Student.student_id == parent_message.sender_id).first()
-                if sender:
-                    recipient_email = sender.email
-            elif parent_message.sender_role.value == "lecturer":
-                sender = db.query(Lecturer).filter(Lecturer.lecturer_id == parent_message.sender_id).first()
-                if sender:
-                    recipient_email = sender.email
-            
-            if not recipient_email:
-                logger.warning(f"Could not find email for sender {parent_message.sender_id}")
-                return
-            
-            # Use email template if available
-            template = EMAIL_TEMPLATES.get("reply_notification", {})
-            subject = template.get("subject", "New reply to your message in Group Discussion")
-            content_template = template.get("template", """
-Dear User,
+            from utils.deadline_reminders import pending_due_times
+            due_times = await run_in_threadpool(pending_due_times)
+            now = datetime.now()
+            future = [due_at for due_at in due_times if due_at > now]
+            for due_at in future:
+                self.arm_reminders(due_at)
+            logger.info(f"Restored {len(future)} deadline reminder timers")
+            if len(future) < len(due_times):
+                await self.process_due_reminders()
+        except Exception as e:
+            logger.error(f"Error restoring deadline reminders: {e}")
 
-{replier_name} has replied to your message. Please check it in the Group Discussion section.
+    async def run_maintenance(self):
+        """Leader housekeeping: re-sync reminder timers in case a NOTIFY was missed, prune the outbox"""
+        try:
+            from utils.notification_outbox import purge_outbox
+            await self.rehydrate_reminders()
+            purged = await run_in_threadpool(purge_outbox)
+            if purged:
+                logger.info(f"Pruned {purged} old outbox rows")
+        except Exception as e:
+            logger.error(f"Error running maintenance: {e}")
 
-Best regards,
-SDMIT Nexus Team
-            """)
-            content = content_template.format(replier_name=replier_name)
-            
-            # Send email
-            success = self.send_email(recipient_email, subject, content)
-            if success:
-                logger.info(f"Reply notification sent to {recipient_email}")
-            
+    def cancel_deadline_reminder(self, document_id: int):
+        """Cancel a scheduled deadline reminder"""
+        try:
+            from utils.deadline_reminders import delete_reminders
+            delete_reminders(document_id)
+            logger.info(f"Deadline reminder cancelled for document {document_id}")
         except Exception as e:
-            logger.error(f"Error sending reply notification: {e}")
+            logger.error(f"Error cancelling deadline reminder: {e}")
 
 # Global instance
 email_service = EmailNotificationService()
@@ -0,0 +1,86 @@
+from typing import Dict, List, Tuple
+from fastapi.encoders import jsonable_encoder
+from models import Notification, NotificationChannel
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+INBOX_CHANNELS = (NotificationChannel.in_app, NotificationChannel.both)
+STREAM_QUEUE_SIZE = 100   # events buffered per open stream; a stalled client misses the rest
+
+# Columns the enqueue functions return for publish()
+INBOX_RETURNING = (
+    Notification.notification_id,
+    Notification.recipient_id,
+    Notification.recipient_role,
+    Notification.channel,
+    Notification.type,
+    Notification.subject,
+    Notification.created_at,
+)
+
+
+class InboxHub:
+    """Pushes new in-app notifications to the recipients' open SSE streams.
+
+    Streams are kept per (role, user id) in this process. publish() is
+    called after the rows commit and may be called from worker threads;
+    it hops onto the event loop before touching the queues.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[Tuple[str, int], List[asyncio.Queue]] = {}
+        self._loop = None
+
+    def subscribe(self, role: str, user_id: int) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.subscribers.setdefault((role, user_id), []).append(queue)
+        return queue
+
+    def unsubscribe(self, role: str, user_id: int, queue: asyncio.Queue):
+        queues = self.subscribers.get((role, user_id))
+        if queues and queue in queues:
+            queues.remove(queue)
+            if not queues:
+                del self.subscribers[(role, user_id)]
+
+    def publish(self, rows):
+        """Fan freshly committed notification rows out to their recipients' streams"""
+        if not self.subscribers or self._loop is None:
+            return
+        events = [
+            ((row.recipient_role.value, row.recipient_id), json.dumps(jsonable_encoder({
+                "type": "notification",
+                "notification_id": row.notification_id,
+                "kind": row.type.value,
+                "subject": row.subject,
+                "created_at": row.created_at,
+            })))
+            for row in rows
+            if row.channel in INBOX_CHANNELS and (row.recipient_role.value, row.recipient_id) in self.subscribers
+        ]
+        if not events:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(events)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, events)
+
+    def _deliver(self, events):
+        for key, data in events:
+            for queue in self.subscribers.get(key, []):
+                try:
+                    queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    logger.warning(f"Inbox stream for {key} is full, dropping an event")
+
+
+# Global instance
+inbox_hub = InboxHub()
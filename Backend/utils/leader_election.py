@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from db import engine
+
+try:
+    from config.email_config import LEADER_LOCK_KEY, LEADER_POLL_INTERVAL
+except ImportError:
+    LEADER_LOCK_KEY = 7261001
+    LEADER_POLL_INTERVAL = 2
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector:
+    """Elects one process among all uvicorn workers with a PostgreSQL advisory lock.
+
+    Every worker keeps trying pg_try_advisory_lock on its own dedicated
+    connection; whoever holds it is the leader. The lock belongs to the
+    session, so if the leader crashes or loses its connection PostgreSQL
+    releases it and another worker takes over on its next poll. The leader
+    also LISTENs on the channels registered with listen(), which is how the other workers hand
+    it work (NOTIFY is sent from their ordinary transactions).
+    """
+
+    def __init__(self, lock_key: int = LEADER_LOCK_KEY, poll_interval: float = LEADER_POLL_INTERVAL):
+        self.lock_key = lock_key
+        self.poll_interval = poll_interval
+        self.is_leader = False
+        self.on_elected: Optional[Callable[[], Awaitable]] = None
+        self.on_demoted: Optional[Callable[[], Awaitable]] = None
+        self._handlers: Dict[str, Callable[[str], Awaitable]] = {}
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+
+    def listen(self, channel: str, handler: Callable[[str], Awaitable]):
+        """Run handler(payload) on the leader for every NOTIFY on channel"""
+        self._handlers[channel] = handler
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self._demote()
+        self._disconnect()
+
+    # ------------------------------
+    # Lock connection
+    # ------------------------------
+    def _connect(self):
+        # A pooled connection detached from the pool: it lives as long as the lock
+        fairy = engine.raw_connection()
+        conn = fairy.driver_connection
+        fairy.detach()
+        conn.autocommit = True
+        self._conn = conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _try_acquire(self) -> bool:
+        if self._conn is None:
+            self._connect()
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+            acquired = cursor.fetchone()[0]
+            if acquired:
+                for channel in self._handlers:
+                    cursor.execute(f'LISTEN "{channel}"')
+            return acquired
+        finally:
+            cursor.close()
+
+    def _check_alive_and_drain(self) -> List[tuple]:
+        """Round trip to prove the session (and so the lock) still exists, then collect NOTIFYs"""
+        driver = self._conn
+        cursor = driver.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+        driver.poll()
+        received = [(n.channel, n.payload) for n in driver.notifies]
+        driver.notifies.clear()
+        return received
+
+    # ------------------------------
+    # Election loop
+    # ------------------------------
+    async def _run(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if await run_in_threadpool(self._try_acquire):
+                        self.is_leader = True
+                        logger.info(f"Elected scheduler leader (advisory lock {self.lock_key})")
+                        if self.on_elected:
+                            await self.on_elected()
+                else:
+                    for channel, payload in await run_in_threadpool(self._check_alive_and_drain):
+                        if channel in self._handlers:
+                            await self._handlers[channel](payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Connection trouble: the lock is gone with the session, step down and retry
+                logger.error(f"Leader election connection failed: {e}")
+                if self.is_leader:
+                    await self._demote()
+                self._disconnect()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _demote(self):
+        self.is_leader = False
+        logger.warning("Stepped down as scheduler leader")
+        if self.on_demoted:
+            try:
+                await self.on_demoted()
+            except Exception as e:
+                logger.error(f"Error stepping down as leader: {e}")
+        self._disconnect()
+
+
+# Global instance
+leader_elector = LeaderElector()
@@ -0,0 +1,215 @@
+import enum
+import heapq
+import itertools
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional
+
+try:
+    from config.email_config import (
+        SMTP_POOL_SIZE, MAIL_RATE_PER_SECOND, MAIL_BURST, MAIL_DAILY_QUOTA,
+        MAIL_URGENT_RESERVE, MAIL_MAX_QUEUE_WAIT
+    )
+except ImportError:
+    SMTP_POOL_SIZE = 4
+    MAIL_RATE_PER_SECOND = 10
+    MAIL_BURST = 100
+    MAIL_DAILY_QUOTA = 2000
+    MAIL_URGENT_RESERVE = 100
+    MAIL_MAX_QUEUE_WAIT = 120
+
+logger = logging.getLogger(__name__)
+
+
+class MailPriority(enum.IntEnum):
+    urgent = 0      # OTP and password emails: someone is waiting on the login screen
+    deadline = 1    # document deadline reminders
+    reply = 2       # chat reply notifications
+    bulk = 3        # group announcements and digests
+
+
+class RateLimited(Exception):
+    """A queued mail job expired before the rate limits let it run"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket; tokens are recipients. Not thread-safe, the scheduler locks around it."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, floor: float = 0) -> float:
+        """Seconds until `cost` tokens can be taken while leaving `floor` in the bucket"""
+        self._refill()
+        missing = cost + floor - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, cost: float):
+        self.tokens -= cost
+
+
+class MailJob:
+    def __init__(self, priority: MailPriority, cost: int, func, args, kwargs, max_wait: Optional[float]):
+        self.priority = priority
+        self.cost = cost
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.submitted = time.monotonic()
+        self.expires_at = self.submitted + max_wait if max_wait is not None else None
+
+
+class MailScheduler:
+    """Runs every outgoing email in priority order under the provider's rate limits.
+
+    Jobs wait in one priority queue; worker threads (one per pooled SMTP
+    session) always take the most urgent job whose recipients fit in both
+    token buckets: a per-second bucket for bursts and a rolling daily bucket
+    for the account quota. The last MAIL_URGENT_RESERVE recipients of the
+    daily quota are kept for urgent and deadline mail, so bulk sends can
+    never lock students out of their OTPs. Non-urgent jobs that wait longer
+    than MAIL_MAX_QUEUE_WAIT fail with RateLimited so their owner can retry
+    later instead of holding work in memory.
+    """
+
+    def __init__(self, workers: int = SMTP_POOL_SIZE, rate: float = MAIL_RATE_PER_SECOND,
+                 burst: int = MAIL_BURST, daily_quota: int = MAIL_DAILY_QUOTA,
+                 urgent_reserve: int = MAIL_URGENT_RESERVE, max_wait: float = MAIL_MAX_QUEUE_WAIT):
+        self.per_second = TokenBucket(rate, burst)
+        self.daily = TokenBucket(daily_quota / 86400, daily_quota)
+        self.urgent_reserve = urgent_reserve
+        self.max_wait = max_wait
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.metrics = {
+            p.name: {"submitted": 0, "sent": 0, "failed": 0, "expired": 0, "waits": deque(maxlen=1000)}
+            for p in MailPriority
+        }
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"mail-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---- Submitting ----
+    def submit(self, priority: MailPriority, func, *args, cost: int = 1, **kwargs) -> Future:
+        """Queue a blocking mail call; cost is the number of recipients it sends to"""
+        max_wait = None if priority == MailPriority.urgent else self.max_wait
+        # A job larger than a bucket could never run; charge it a full bucket instead
+        cost = max(1, min(cost, self.per_second.capacity, self.daily.capacity - self.urgent_reserve))
+        job = MailJob(priority, cost, func, args, kwargs, max_wait)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Mail scheduler is shut down")
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self.metrics[priority.name]["submitted"] += 1
+            self._cond.notify()
+        return job.future
+
+    def run(self, priority: MailPriority, func, *args, cost: int = 1, timeout: Optional[float] = None, **kwargs):
+        """submit() and wait for the result, for callers that must report success"""
+        return self.submit(priority, func, *args, cost=cost, **kwargs).result(timeout)
+
+    # ---- Workers ----
+    def _next_job(self) -> Optional[MailJob]:
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                job = self._heap[0][2]
+                now = time.monotonic()
+                if job.future.cancelled():
+                    heapq.heappop(self._heap)
+                    continue
+
+                floor = 0 if job.priority <= MailPriority.deadline else self.urgent_reserve
+                wait = max(self.per_second.wait_time(job.cost), self.daily.wait_time(job.cost, floor))
+                if wait == 0:
+                    heapq.heappop(self._heap)
+                    self.per_second.take(job.cost)
+                    self.daily.take(job.cost)
+                    return job
+
+                if job.expires_at is not None and now + wait > job.expires_at:
+                    heapq.heappop(self._heap)
+                    self.metrics[job.priority.name]["expired"] += 1
+                    job.future.set_exception(RateLimited(
+                        f"{job.priority.name} mail rate limited for {now - job.submitted:.0f}s", wait
+                    ))
+                    continue
+                # Sleep until tokens are back; a newly queued, more urgent job wakes us early
+                self._cond.wait(wait)
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            stats = self.metrics[job.priority.name]
+            stats["waits"].append(time.monotonic() - job.submitted)
+            try:
+                job.future.set_result(job.func(*job.args, **job.kwargs))
+                stats["sent"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                job.future.set_exception(e)
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            pending, self._heap = self._heap, []
+            self._cond.notify_all()
+        for _, _, job in pending:
+            job.future.cancel()
+
+    # ---- Metrics ----
+    def stats(self) -> dict:
+        with self._cond:
+            depth = {p.name: 0 for p in MailPriority}
+            for priority, _, _ in self._heap:
+                depth[MailPriority(priority).name] += 1
+            tokens = {
+                "per_second": round(self.per_second.tokens, 1),
+                "daily": round(self.daily.tokens, 1)
+            }
+
+        classes = {}
+        for name, stats in self.metrics.items():
+            waits = sorted(stats["waits"])
+            classes[name] = {
+                "queue_depth": depth[name],
+                "submitted": stats["submitted"],
+                "sent": stats["sent"],
+                "failed": stats["failed"],
+                "expired": stats["expired"],
+                "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                "wait_max_seconds": round(waits[-1], 3) if waits else 0.0,
+            }
+        return {"classes": classes, "tokens": tokens}
+
+
+# Global instance
+mail_scheduler = MailScheduler()
@@ -0,0 +1,497 @@
+from typing import List, Optional
+from collections import deque
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Interval, and_, bindparam, case, cast, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from db import SessionLocal
+from models import (
+    Notification, NotificationType, NotificationChannel, NotificationStatus,
+    RecipientRole, Student, Lecturer, DoubtClarification
+)
+from utils.email_notifications import email_service
+from utils.mail_scheduler import MailPriority, RateLimited
+from utils.inbox import INBOX_RETURNING
+import asyncio
+import smtplib
+import time
+import logging
+
+try:
+    from config.email_config import (
+        OUTBOX_WORKERS, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE_SECONDS,
+        OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_SECONDS, DIGEST_WINDOW_SECONDS, DIGEST_MAX_ITEMS,
+        OUTBOX_RETENTION_DAYS, REPLY_DIGEST_WINDOW_SECONDS
+    )
+except ImportError:
+    OUTBOX_WORKERS = 2
+    OUTBOX_BATCH_SIZE = 50
+    OUTBOX_POLL_INTERVAL = 2
+    OUTBOX_LEASE_SECONDS = 300
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_RETRY_BASE_SECONDS = 30
+    DIGEST_WINDOW_SECONDS = 120
+    DIGEST_MAX_ITEMS = 10
+    OUTBOX_RETENTION_DAYS = 30
+    REPLY_DIGEST_WINDOW_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+EMAIL_CHANNELS = (NotificationChannel.email, NotificationChannel.both)
+
+# Group uploads that are coalesced into digests, with the wording used to list them
+DIGEST_LABELS = {
+    NotificationType.material_update: "study materials",
+    NotificationType.event_update: "event announcements",
+    NotificationType.document_update: "documents to sign",
+}
+
+# Mail scheduler class per notification type; anything else is bulk
+TYPE_PRIORITY = {
+    NotificationType.document_reminder: MailPriority.deadline,
+    NotificationType.doubt_reply: MailPriority.reply,
+}
+
+# Rejections that will not succeed on retry
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, ValueError)
+
+
+# -----------------------------
+# Enqueue. These only add rows to the caller's session; the caller commits
+# them together with the content they announce, then wakes the dispatcher
+# and publishes the returned rows to the in-app inbox.
+# -----------------------------
+def delivery_state(channel):
+    """status and sent_at for a new row: in-app only rows are delivered by the insert itself"""
+    in_app = channel == NotificationChannel.in_app
+    status = case((in_app, NotificationStatus.sent.value), else_=NotificationStatus.pending.value)
+    return cast(status, Notification.status.type), case((in_app, func.now()))
+
+
+def open_window(group_id: int, type: NotificationType):
+    """Pending, never attempted rows of one (group, type) that are not due yet"""
+    return and_(
+        Notification.group_id == group_id,
+        Notification.type == type,
+        Notification.status == NotificationStatus.pending,
+        Notification.attempts == 0,
+        Notification.next_attempt_at > func.now()
+    )
+
+
+def enqueue_group(db: Session, group_id: int, type: NotificationType, subject: str, content: str,
+                  item_title: Optional[str] = None, where=None) -> list:
+    """One notification row per student of the group, in a single INSERT ... SELECT.
+
+    `where` narrows the students further, e.g. to those who haven't signed.
+    Each row goes out on the student's own notification_channel; in-app only
+    rows never enter the email outbox. Returns the inserted rows for
+    inbox_hub.publish().
+
+    Digest types are not due immediately: they join the group's open window
+    for that type, or open one DIGEST_WINDOW_SECONDS long, so a burst of
+    uploads reaches each student as one email.
+    """
+    if type in DIGEST_LABELS:
+        window_end = select(func.min(Notification.next_attempt_at)).where(open_window(group_id, type)).scalar_subquery()
+        due = func.coalesce(window_end, func.now() + timedelta(seconds=DIGEST_WINDOW_SECONDS))
+    else:
+        due = func.now()
+
+    recipients = select(
+        Student.student_id,
+        literal(RecipientRole.student, Notification.recipient_role.type),
+        Student.email,
+        literal(group_id),
+        literal(type, Notification.type.type),
+        Student.notification_channel,
+        *delivery_state(Student.notification_channel),
+        literal(subject),
+        literal(content),
+        literal(item_title),
+        due
+    ).where(Student.group_id == group_id, Student.email.isnot(None))
+    if where is not None:
+        recipients = recipients.where(where)
+
+    inserted = db.execute(insert(Notification).from_select(
+        ["recipient_id", "recipient_role", "recipient_email", "group_id", "type",
+         "channel", "status", "sent_at", "subject", "message", "item_title", "next_attempt_at"],
+        recipients
+    ).returning(*INBOX_RETURNING)).all()
+
+    if type in DIGEST_LABELS:
+        # Each upload commits with its own now(), so distinct created_at values count uploads
+        uploads = (
+            select(func.count(func.distinct(Notification.created_at)))
+            .where(open_window(group_id, type))
+            .scalar_subquery()
+        )
+        db.execute(
+            update(Notification)
+            .where(open_window(group_id, type), uploads >= DIGEST_MAX_ITEMS)
+            .values(next_attempt_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    return inserted
+
+
+def enqueue_replies(db: Session, replies: List[dict]) -> list:
+    """Outbox rows for the authors of the messages being replied to.
+
+    Each reply is a dict with parent_id, group_id, sender_id, sender_role and
+    sender_name. Self-replies are skipped. One query returns each parent's
+    author, their email and the end of any open reply window for that
+    (thread, recipient); new rows join that window or open one
+    REPLY_DIGEST_WINDOW_SECONDS long, so a busy thread reaches its author
+    as one email listing who replied. Students get it on their own
+    notification_channel, lecturers on both. Returns the inserted rows for
+    inbox_hub.publish().
+    """
+    if not replies:
+        return []
+    recipient_email = case(
+        (DoubtClarification.sender_role == RecipientRole.student, Student.email),
+        (DoubtClarification.sender_role == RecipientRole.lecturer, Lecturer.email),
+    )
+    recipient_channel = func.coalesce(
+        Student.notification_channel, literal(NotificationChannel.both, Student.notification_channel.type)
+    )
+    window_end = (
+        select(func.min(Notification.next_attempt_at))
+        .where(
+            Notification.thread_id == DoubtClarification.doubt_id,
+            Notification.recipient_id == DoubtClarification.sender_id,
+            Notification.recipient_role == DoubtClarification.sender_role,
+            Notification.type == NotificationType.doubt_reply,
+            Notification.status == NotificationStatus.pending,
+            Notification.attempts == 0,
+            Notification.next_attempt_at > func.now()
+        )
+        .correlate(DoubtClarification)
+        .scalar_subquery()
+    )
+    parents = {
+        r.doubt_id: r for r in (
+            db.query(
+                DoubtClarification.doubt_id,
+                DoubtClarification.sender_id,
+                DoubtClarification.sender_role,
+                recipient_email.label("email"),
+                recipient_channel.label("channel"),
+                func.coalesce(window_end, func.now() + timedelta(seconds=REPLY_DIGEST_WINDOW_SECONDS)).label("due")
+            )
+            .outerjoin(Student, and_(
+                DoubtClarification.sender_role == RecipientRole.student,
+                Student.student_id == DoubtClarification.sender_id
+            ))
+            .outerjoin(Lecturer, and_(
+                DoubtClarification.sender_role == RecipientRole.lecturer,
+                Lecturer.lecturer_id == DoubtClarification.sender_id
+            ))
+            .filter(DoubtClarification.doubt_id.in_({r["parent_id"] for r in replies}))
+        )
+    }
+
+    rows = []
+    for reply in replies:
+        parent = parents.get(reply["parent_id"])
+        if parent is None or not parent.email:
+            continue
+        if parent.sender_id == reply["sender_id"] and parent.sender_role.value == reply["sender_role"]:
+            continue
+        subject, content = email_service.reply_message(reply["sender_name"])
+        in_app = parent.channel == NotificationChannel.in_app
+        rows.append({
+            "recipient_id": parent.sender_id,
+            "recipient_role": parent.sender_role,
+            "recipient_email": parent.email,
+            "group_id": reply["group_id"],
+            "type": NotificationType.doubt_reply,
+            "channel": parent.channel,
+            "status": NotificationStatus.sent if in_app else NotificationStatus.pending,
+            "sent_at": datetime.now() if in_app else None,
+            "subject": subject,
+            "message": content,
+            "item_title": reply["sender_name"],
+            "thread_id": parent.doubt_id,
+            "next_attempt_at": parent.due,
+        })
+    if not rows:
+        return []
+    return db.execute(insert(Notification).returning(*INBOX_RETURNING), rows).all()
+
+
+# -----------------------------
+# Claim and record. Each call is its own short transaction; no lock is held
+# while mail is being sent.
+# -----------------------------
+def claim_batch(limit: int) -> list:
+    """Lease up to `limit` due rows to this worker.
+
+    SKIP LOCKED lets any number of workers, in any number of processes,
+    claim disjoint batches. Pushing next_attempt_at out by the lease keeps
+    other workers off the rows after commit, and hands them back if this
+    worker dies before recording a result.
+    """
+    db = SessionLocal()
+    try:
+        due = (
+            select(Notification.notification_id)
+            .where(
+                Notification.status == NotificationStatus.pending,
+                Notification.next_attempt_at <= func.now(),
+                Notification.channel.in_(EMAIL_CHANNELS)
+            )
+            # A recipient's rows of one window are adjacent, so they are usually claimed together
+            .order_by(Notification.next_attempt_at, Notification.recipient_email, Notification.group_id, Notification.type)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = db.execute(
+            update(Notification)
+            .where(Notification.notification_id.in_(due.scalar_subquery()))
+            .values(
+                attempts=Notification.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            )
+            .returning(
+                Notification.notification_id,
+                Notification.recipient_email,
+                Notification.group_id,
+                Notification.type,
+                Notification.subject,
+                Notification.message,
+                Notification.item_title,
+                Notification.thread_id,
+                Notification.attempts
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        return rows
+    finally:
+        db.close()
+
+
+def record_results(sent_ids: List[int], failures: List[dict]):
+    """Mark sent rows in one UPDATE and reschedule or fail the rest"""
+    db = SessionLocal()
+    try:
+        if sent_ids:
+            db.execute(
+                update(Notification)
+                .where(Notification.notification_id.in_(sent_ids))
+                .values(status=NotificationStatus.sent, sent_at=func.now(), last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+        if failures:
+            table = Notification.__table__
+            db.execute(
+                update(table)
+                .where(table.c.notification_id == bindparam("nid"))
+                .values(
+                    status=bindparam("new_status"),
+                    attempts=bindparam("new_attempts"),
+                    last_error=bindparam("error"),
+                    next_attempt_at=func.now() + bindparam("delay", type_=Interval)
+                ),
+                failures
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def outbox_backlog(db: Session) -> dict:
+    """Pending rows, how many are due now, and the age of the oldest one"""
+    row = db.query(
+        func.count(),
+        func.count().filter(Notification.next_attempt_at <= func.now()),
+        func.extract("epoch", func.now() - func.min(Notification.created_at))
+    ).filter(Notification.status == NotificationStatus.pending).one()
+    return {
+        "pending": row[0],
+        "due": row[1],
+        "oldest_pending_age_seconds": round(float(row[2]), 1) if row[2] is not None else 0.0
+    }
+
+
+def purge_outbox(retention_days: int = OUTBOX_RETENTION_DAYS) -> int:
+    """Delete email-only rows that were sent or gave up more than retention_days ago"""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            delete(Notification).where(
+                Notification.channel == NotificationChannel.email,
+                Notification.status != NotificationStatus.pending,
+                Notification.created_at < func.now() - timedelta(days=retention_days)
+            )
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+
+class NotificationDispatcher:
+    """Pool of async workers that drain the notification outbox.
+
+    Workers claim batches in the threadpool, merge a recipient's digestible
+    rows into one email, send identical emails as bulk envelopes through the
+    mail scheduler at their type's priority, and record every outcome in one round trip per
+    batch. Failed rows are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS, then marked failed.
+    """
+
+    def __init__(self, workers: int = OUTBOX_WORKERS, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        # sent counts outbox rows; emails counts recipient emails, fewer when rows merge into digests
+        self.metrics = {"sent": 0, "emails": 0, "digests": 0, "failed": 0, "retried": 0, "batches": 0}
+        self.recent_sends: deque = deque()   # (monotonic time, count) per batch, last minute only
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Notification dispatcher started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        """Start dispatching right away instead of at the next poll. Safe from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _worker(self, number: int):
+        while True:
+            try:
+                self._wakeup.clear()
+                batch = await run_in_threadpool(claim_batch, self.batch_size)
+                if not batch:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._dispatch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker {number} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    @staticmethod
+    def _coalesce(batch) -> List[list]:
+        """Split a claimed batch into emails: digest types merge per recipient, group and type,
+        replies per recipient and thread. Replies whose message was deleted go out alone."""
+        emails = {}
+        for row in batch:
+            if row.type in DIGEST_LABELS:
+                key = (row.recipient_email, row.group_id, row.type)
+            elif row.type == NotificationType.doubt_reply and row.thread_id is not None:
+                key = (row.recipient_email, row.thread_id, row.type)
+            else:
+                key = row.notification_id
+            emails.setdefault(key, []).append(row)
+        return list(emails.values())
+
+    @staticmethod
+    def _render(rows):
+        first = rows[0]
+        if len(rows) == 1:
+            return first.subject, first.message
+        if first.type == NotificationType.doubt_reply:
+            return email_service.reply_digest_message([row.item_title for row in rows])
+        titles = [row.item_title or row.subject for row in rows]
+        return email_service.digest_message(DIGEST_LABELS[first.type], titles)
+
+    async def _send_all(self, emails: List[list]) -> list:
+        """Send every email of a batch; identical ones share bulk envelopes.
+
+        Returns (rows, error) per email, so each outbox row still gets its own
+        delivery state.
+        """
+        by_content = {}
+        results = []
+        for rows in emails:
+            if not rows[0].recipient_email:
+                results.append((rows, ValueError("Recipient has no email address")))
+                continue
+            priority = TYPE_PRIORITY.get(rows[0].type, MailPriority.bulk)
+            # Two emails with the same text for one recipient go out once, and
+            # both sets of rows share that outcome
+            recipients = by_content.setdefault((priority, *self._render(rows)), {})
+            recipients.setdefault(rows[0].recipient_email, []).extend(rows)
+
+        outcomes = await asyncio.gather(*(
+            email_service.send_bulk_async(list(recipients), subject, content, priority)
+            for (priority, subject, content), recipients in by_content.items()
+        ))
+        for recipients, outcome in zip(by_content.values(), outcomes):
+            results.extend((rows, outcome[email]) for email, rows in recipients.items())
+        return results
+
+    async def _dispatch(self, batch):
+        results = await self._send_all(self._coalesce(batch))
+
+        sent_ids, failures = [], []
+        sent_emails = 0
+        for rows, error in results:
+            if error is None:
+                sent_emails += 1
+                sent_ids.extend(row.notification_id for row in rows)
+                continue
+            for row in rows:
+                if isinstance(error, RateLimited):
+                    # Out of sending quota is not the row's fault: hand the attempt back
+                    failures.append({
+                        "nid": row.notification_id,
+                        "new_status": NotificationStatus.pending,
+                        "new_attempts": row.attempts - 1,
+                        "error": str(error)[:500],
+                        "delay": timedelta(seconds=max(error.retry_after, OUTBOX_RETRY_BASE_SECONDS))
+                    })
+                    continue
+                permanent = isinstance(error, PERMANENT_ERRORS) or row.attempts >= OUTBOX_MAX_ATTEMPTS
+                failures.append({
+                    "nid": row.notification_id,
+                    "new_status": NotificationStatus.failed if permanent else NotificationStatus.pending,
+                    "new_attempts": row.attempts,
+                    "error": str(error)[:500],
+                    "delay": timedelta(seconds=OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1))
+                })
+            logger.warning(f"Notification email to {rows[0].recipient_email} ({len(rows)} rows) "
+                           f"attempt {rows[0].attempts} failed: {error}")
+
+        await run_in_threadpool(record_results, sent_ids, failures)
+
+        failed = sum(1 for f in failures if f["new_status"] == NotificationStatus.failed)
+        self.metrics["batches"] += 1
+        self.metrics["sent"] += len(sent_ids)
+        self.metrics["emails"] += sent_emails
+        self.metrics["digests"] += sum(1 for rows, error in results if error is None and len(rows) > 1)
+        self.metrics["failed"] += failed
+        self.metrics["retried"] += len(failures) - failed
+        self.recent_sends.append((time.monotonic(), sent_emails))
+
+    def throughput(self) -> float:
+        """Emails sent per second by this process over the last minute"""
+        cutoff = time.monotonic() - 60
+        while self.recent_sends and self.recent_sends[0][0] < cutoff:
+            self.recent_sends.popleft()
+        return round(sum(count for _, count in self.recent_sends) / 60, 2)
+
+
+# Global instance
+notification_dispatcher = NotificationDispatcher()
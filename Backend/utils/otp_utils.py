@@ -1,12 +1,13 @@
 import os
 import random
-import smtplib
 import bcrypt
 from datetime import datetime, timezone, timedelta
 from email.message import EmailMessage
 from sqlalchemy.orm import Session
 from models import OTPVerification
 from db import SessionLocal
+from utils.smtp_pool import get_smtp_pool, SMTP_TIMEOUT
+from utils.mail_scheduler import mail_scheduler, MailPriority
 
 # ------------------------------
 # Configuration
@@ -38,12 +39,6 @@ def send_email(to_email: str, otp: str) -> bool:
             print("❌ Email credentials missing. Set BACKEND_EMAIL and BACKEND_EMAIL_APP_PASSWORD.")
             return False
 
-        server = smtplib.SMTP("smtp.gmail.com", 587, timeout=15)
-        server.ehlo()
-        server.starttls()
-        server.ehlo()
-        server.login(FROM_EMAIL, APP_PASSWORD)
-
         msg = EmailMessage()
 
         # Single subject for both cases
@@ -66,8 +61,11 @@ SDMIT Nexus Team
         msg["To"] = to_email
         msg.set_content(content)
 
-        server.send_message(msg)
-        server.quit()
+        # Urgent class: jumps ahead of queued group notifications
+        mail_scheduler.run(
+            MailPriority.urgent, get_smtp_pool(FROM_EMAIL, APP_PASSWORD).send_message, msg,
+            timeout=SMTP_TIMEOUT * 2
+        )
         print(f"Email sent successfully to {to_email}")
         return True
 
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from db import engine
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 2   # seconds between attempts after the connection drops
+
+
+class PgListener:
+    """LISTENs on PostgreSQL channels in every worker and runs a handler per NOTIFY.
+
+    Unlike the leader's LISTEN (utils/leader_election.py) this runs in all
+    processes, for state each of them keeps in memory. The connection's
+    socket is watched by the event loop, so notifications arrive as soon as
+    the sending transaction commits, without polling. Notifications sent
+    while the connection is down are lost; on_reconnect runs after every
+    reconnect so callers can drop whatever they may have missed.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Callable[[str], None]] = {}
+        self.on_reconnect: Optional[Callable[[], None]] = None
+        self._conn = None
+        self._loop = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    def listen(self, channel: str, handler: Callable[[str], None]):
+        """Call handler(payload) on the event loop for every NOTIFY on channel"""
+        self._handlers[channel] = handler
+
+    # ------------------------------
+    # Lifecycle
+    # ------------------------------
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        self._reconnect = asyncio.create_task(self._connect_loop(first=True))
+
+    async def stop(self):
+        self._stopped = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+            try:
+                await self._reconnect
+            except asyncio.CancelledError:
+                pass
+            self._reconnect = None
+        self._disconnect()
+
+    # ------------------------------
+    # Connection
+    # ------------------------------
+    def _connect(self):
+        """Open the connection and LISTEN. Blocking, so it runs in the threadpool"""
+        # A pooled connection detached from the pool, like the leader's lock connection
+        fairy = engine.raw_connection()
+        conn = fairy.driver_connection
+        fairy.detach()
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            try:
+                for channel in self._handlers:
+                    cursor.execute(f'LISTEN "{channel}"')
+            finally:
+                cursor.close()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            try:
+                self._loop.remove_reader(self._conn.fileno())
+            except Exception:
+                pass
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _connect_loop(self, first: bool = False):
+        while not self._stopped:
+            try:
+                self._conn = await run_in_threadpool(self._connect)
+                self._loop.add_reader(self._conn.fileno(), self._on_readable)
+                if not first and self.on_reconnect:
+                    self.on_reconnect()
+                logger.info(f"Listening for {', '.join(self._handlers)}")
+                return
+            except Exception as e:
+                logger.error(f"Listener connection failed: {e}")
+                self._disconnect()
+                first = False
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.error(f"Listener connection lost: {e}")
+            self._disconnect()
+            if not self._stopped:
+                self._reconnect = asyncio.ensure_future(self._connect_loop())
+            return
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            handler = self._handlers.get(notify.channel)
+            if handler is None:
+                continue
+            try:
+                handler(notify.payload)
+            except Exception as e:
+                logger.error(f"Error handling {notify.channel} notification: {e}")
+
+
+# Global instance
+pg_listener = PgListener()
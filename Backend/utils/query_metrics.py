@@ -0,0 +1,203 @@
+import re
+import threading
+import time
+import logging
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+try:
+    from config.db_config import QUERY_DEBUG, QUERY_BUDGET, QUERY_REPEAT_THRESHOLD
+except ImportError:
+    QUERY_DEBUG = False
+    QUERY_BUDGET = 20
+    QUERY_REPEAT_THRESHOLD = 5
+
+logger = logging.getLogger(__name__)
+
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|%s")
+_PARAM_LIST = re.compile(r"\?(\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with every bound value (and IN lists of any length) collapsed to one ?"""
+    shape = _PARAM.sub("?", statement)
+    shape = _PARAM_LIST.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+# -----------------------------
+# Pool checkout timing
+# -----------------------------
+class _TimedCheckout:
+    """Times how long each checkout waits for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeout:
+            query_metrics.record_checkout(self, time.perf_counter() - start, timed_out=True)
+            raise
+        query_metrics.record_checkout(self, time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+# -----------------------------
+# Per-request counters
+# -----------------------------
+class RequestQueries:
+    """Statements run on behalf of one HTTP request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated(self):
+        """The most repeated statement shape and how often it ran"""
+        if not self.shapes:
+            return None, 0
+        return self.shapes.most_common(1)[0]
+
+    def problems(self, budget: int = QUERY_BUDGET, repeat_threshold: int = QUERY_REPEAT_THRESHOLD) -> list:
+        found = []
+        if self.count > budget:
+            found.append(f"{self.count} queries (budget {budget})")
+        shape, times = self.repeated()
+        if times >= repeat_threshold:
+            found.append(f"same statement {times} times: {shape[:200]}")
+        return found
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+class QueryMetrics:
+    """Pool and query instrumentation shared by the sync and async engines.
+
+    instrument() hooks an engine's cursor events, so every statement is
+    counted and timed, globally and against the request that is currently
+    running (tracked in a ContextVar, which follows sync routes into the
+    threadpool and async sessions into their greenlets). Statements from
+    background work such as the outbox dispatcher only count globally.
+    The pool classes above report checkout waits here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engines = {}
+        self.checkout_waits: Dict[str, deque] = {}
+        self.checkout_timeouts: Counter = Counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.routes: Dict[str, dict] = {}
+        self.flagged: deque = deque(maxlen=50)
+
+    # ---- Engines ----
+    def instrument(self, name: str, engine):
+        """Start counting statements and checkouts for engine (a sync Engine, or AsyncEngine.sync_engine)"""
+        self.engines[name] = engine
+        self.checkout_waits[name] = deque(maxlen=1000)
+        engine.pool._metrics_name = name
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def record_checkout(self, pool, seconds: float, timed_out: bool = False):
+        name = getattr(pool, "_metrics_name", None)
+        if name is None:
+            return
+        if timed_out:
+            self.checkout_timeouts[name] += 1
+        else:
+            self.checkout_waits[name].append(seconds)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += elapsed
+        request = _current.get()
+        if request is not None:
+            request.count += 1
+            request.seconds += elapsed
+            request.shapes[statement_shape(statement)] += 1
+
+    # ---- Requests ----
+    def begin_request(self) -> RequestQueries:
+        request = RequestQueries()
+        _current.set(request)
+        return request
+
+    def end_request(self, route: str, request: RequestQueries):
+        """Fold one finished request into the per-route totals; returns its problems in debug mode"""
+        with self._lock:
+            stats = self.routes.setdefault(route, {"requests": 0, "queries": 0, "seconds": 0.0, "max_queries": 0})
+            stats["requests"] += 1
+            stats["queries"] += request.count
+            stats["seconds"] += request.seconds
+            stats["max_queries"] = max(stats["max_queries"], request.count)
+
+        if not QUERY_DEBUG:
+            return []
+        problems = request.problems()
+        if problems:
+            logger.warning(f"Query budget exceeded on {route}: {'; '.join(problems)}")
+            self.flagged.append({"route": route, "queries": request.count, "problems": problems})
+        return problems
+
+    # ---- Metrics ----
+    def stats(self) -> dict:
+        pools = {}
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            waits = sorted(self.checkout_waits[name])
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            pools[name] = {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "utilisation": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+                "checkout_timeouts": self.checkout_timeouts[name],
+                "checkout_wait_p50_ms": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                "checkout_wait_p95_ms": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                "checkout_wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+            }
+
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": s["requests"],
+                    "avg_queries": round(s["queries"] / s["requests"], 1),
+                    "max_queries": s["max_queries"],
+                    "avg_db_ms": round(s["seconds"] / s["requests"] * 1000, 2),
+                }
+                for route, s in sorted(self.routes.items(), key=lambda item: -item[1]["queries"])
+            }
+            return {
+                "pools": pools,
+                "queries_total": self.queries,
+                "query_seconds_total": round(self.query_seconds, 3),
+                "routes": routes,
+                "flagged": list(self.flagged),
+            }
+
+
+# Global instance
+query_metrics = QueryMetrics()
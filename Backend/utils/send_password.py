@@ -1,6 +1,7 @@
-import smtplib
 from email.message import EmailMessage
 import secrets, string
+from utils.smtp_pool import get_smtp_pool, SMTP_TIMEOUT
+from utils.mail_scheduler import mail_scheduler, MailPriority
 
 
 WORDS = ["river", "cloud", "star", "moon", "tree", "ocean", "storm", "fire", "wind", "stone"]
@@ -21,12 +22,6 @@ def send_password_email(to_email: str, password: str) -> bool:
             print("Email credentials missing. Set BACKEND_EMAIL and BACKEND_EMAIL_APP_PASSWORD.")
             return False
 
-        server = smtplib.SMTP("smtp.gmail.com", 587, timeout=15)
-        server.ehlo()
-        server.starttls()
-        server.ehlo()
-        server.login(FROM_EMAIL, APP_PASSWORD)
-
         msg = EmailMessage()
 
         #Subject for lecturer password email
@@ -52,8 +47,11 @@ SDMIT Nexus Team
         msg["To"] = to_email
         msg.set_content(content)
 
-        server.send_message(msg)
-        server.quit()
+        # Urgent class: jumps ahead of queued group notifications
+        mail_scheduler.run(
+            MailPriority.urgent, get_smtp_pool(FROM_EMAIL, APP_PASSWORD).send_message, msg,
+            timeout=SMTP_TIMEOUT * 2
+        )
         print(f"Password email sent successfully to {to_email}")
         return True
 
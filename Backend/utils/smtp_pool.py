@@ -0,0 +1,188 @@
+import smtplib
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Dict, Optional, Tuple
+
+try:
+    from config.email_config import (
+        SMTP_SERVER, SMTP_PORT, SMTP_TIMEOUT, SMTP_USE_TLS, SMTP_POOL_SIZE,
+        SMTP_POOL_MAX_IDLE, SMTP_POOL_HEALTHCHECK_AFTER, SMTP_MAX_MESSAGES_PER_CONNECTION
+    )
+except ImportError:
+    SMTP_SERVER = "smtp.gmail.com"
+    SMTP_PORT = 587
+    SMTP_TIMEOUT = 15
+    SMTP_USE_TLS = True
+    SMTP_POOL_SIZE = 4
+    SMTP_POOL_MAX_IDLE = 60
+    SMTP_POOL_HEALTHCHECK_AFTER = 5
+    SMTP_MAX_MESSAGES_PER_CONNECTION = 90
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool of authenticated SMTP sessions for one sending account.
+
+    Sessions are reused across messages so STARTTLS and login happen once per
+    connection instead of once per email. At most max_connections are open at
+    a time; callers beyond that wait for a free one.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        timeout: Optional[float] = None,
+        use_tls: Optional[bool] = None,
+        max_idle: Optional[float] = None,
+        healthcheck_after: Optional[float] = None,
+        max_messages: Optional[int] = None,
+    ):
+        # Unset options fall back to the module settings at construction time
+        self.username = username
+        self.password = password
+        self.host = host or SMTP_SERVER
+        self.port = port or SMTP_PORT
+        self.max_connections = max_connections or SMTP_POOL_SIZE
+        self.timeout = timeout or SMTP_TIMEOUT
+        self.use_tls = SMTP_USE_TLS if use_tls is None else use_tls
+        self.max_idle = SMTP_POOL_MAX_IDLE if max_idle is None else max_idle
+        self.healthcheck_after = SMTP_POOL_HEALTHCHECK_AFTER if healthcheck_after is None else healthcheck_after
+        self.max_messages = max_messages or SMTP_MAX_MESSAGES_PER_CONNECTION
+        self._idle: list[PooledConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self.stats = {"connects": 0, "reused": 0, "discarded": 0, "sent": 0}
+
+    def _connect(self) -> PooledConnection:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        self.stats["connects"] += 1
+        return PooledConnection(server)
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_usable(self, conn: PooledConnection) -> bool:
+        idle_for = time.monotonic() - conn.last_used
+        if idle_for > self.max_idle or conn.sent >= self.max_messages:
+            return False
+        if idle_for < self.healthcheck_after:
+            # Its last command succeeded moments ago
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._is_usable(conn):
+                self.stats["reused"] += 1
+                return conn
+            self.stats["discarded"] += 1
+            self._close(conn.server)
+
+    @contextmanager
+    def connection(self):
+        """Borrow an authenticated session (use .server). Broken sessions are not returned to the pool."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No SMTP connection free within {self.timeout}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # The server rejected this message, not the session; smtplib already sent RSET
+            raise
+        except Exception:
+            if conn is not None:
+                self._close(conn.server)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def send_message(self, msg: EmailMessage, to_addrs=None) -> dict:
+        """Send on a pooled session, retrying once on a fresh one if the session died"""
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    refused = conn.server.send_message(msg, to_addrs=to_addrs)
+                    conn.sent += 1
+                self.stats["sent"] += 1
+                return refused
+            except smtplib.SMTPServerDisconnected:
+                if attempt == 1:
+                    raise
+                logger.info("SMTP session dropped by server, reconnecting")
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn.server)
+
+
+_pools: Dict[Tuple[str, int, str], SMTPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(username: str, password: str, **options) -> SMTPConnectionPool:
+    """Shared pool per (host, port, account), so every sender reuses the same sessions"""
+    key = (options.get("host") or SMTP_SERVER, options.get("port") or SMTP_PORT, username)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.password != password:
+            pool.close_all()
+            pool = None
+        if pool is None:
+            pool = SMTPConnectionPool(username, password, **options)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -1,23 +1,114 @@
-from typing import Dict, List
+from typing import Dict, Optional
 from fastapi import WebSocket
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 256   # outbound messages buffered per socket before it is treated as dead
+SEND_TIMEOUT = 10       # seconds a single send may take before the socket is evicted
+PING_INTERVAL = 20      # seconds between keepalive pings
+PONG_TIMEOUT = 60       # a socket silent for this long is considered half-open
+
+
+class Connection:
+    """A connected socket with its own bounded outbound queue and sender task"""
+
+    def __init__(self, websocket: WebSocket, group_id: int):
+        self.websocket = websocket
+        self.group_id = group_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.last_seen = time.monotonic()
+        self.tasks: list[asyncio.Task] = []
+
+    def enqueue(self, payload: str) -> bool:
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
 
 class ConnectionManager:
     def __init__(self):
-        # key: group_id, value: list of connected websockets
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+        # key: group_id, value: {websocket: Connection}
+        self.active_connections: Dict[int, Dict[WebSocket, Connection]] = {}
 
     async def connect(self, websocket: WebSocket, group_id: int):
-        if group_id not in self.active_connections:
-            self.active_connections[group_id] = []
-        self.active_connections[group_id].append(websocket)
+        conn = Connection(websocket, group_id)
+        conn.tasks = [
+            asyncio.create_task(self._sender(conn)),
+            asyncio.create_task(self._keepalive(conn)),
+        ]
+        self.active_connections.setdefault(group_id, {})[websocket] = conn
 
     def disconnect(self, websocket: WebSocket, group_id: int):
-        if group_id in self.active_connections:
-            self.active_connections[group_id].remove(websocket)
-            if not self.active_connections[group_id]:
-                del self.active_connections[group_id]
+        """Forget a socket and stop its tasks. Safe to call more than once."""
+        connections = self.active_connections.get(group_id)
+        if not connections:
+            return
+        conn = connections.pop(websocket, None)
+        if not connections:
+            del self.active_connections[group_id]
+        if conn:
+            current = asyncio.current_task()
+            for task in conn.tasks:
+                if task is not current:
+                    task.cancel()
+
+    def touch(self, websocket: WebSocket, group_id: int):
+        """Record inbound traffic from a socket so keepalive knows it is alive"""
+        conn = self._get(websocket, group_id)
+        if conn:
+            conn.last_seen = time.monotonic()
 
     async def broadcast(self, group_id: int, message: dict):
-        if group_id in self.active_connections:
-            for connection in self.active_connections[group_id]:
-                await connection.send_json(message)
\ No newline at end of file
+        """Serialise once and queue for every socket in the group without waiting on any of them"""
+        connections = self.active_connections.get(group_id)
+        if not connections:
+            return
+        payload = json.dumps(message, default=str)
+        for conn in list(connections.values()):
+            if not conn.enqueue(payload):
+                logger.warning(f"Evicting slow websocket in group {group_id}: outbound queue full")
+                await self._evict(conn, code=1013)
+
+    async def send_personal(self, websocket: WebSocket, group_id: int, message: dict):
+        """Queue a message for a single socket, preserving ordering with broadcasts"""
+        conn = self._get(websocket, group_id)
+        if conn and not conn.enqueue(json.dumps(message, default=str)):
+            await self._evict(conn, code=1013)
+
+    def _get(self, websocket: WebSocket, group_id: int) -> Optional[Connection]:
+        return self.active_connections.get(group_id, {}).get(websocket)
+
+    async def _sender(self, conn: Connection):
+        try:
+            while True:
+                payload = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(payload), SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Evicting dead websocket in group {conn.group_id}: {e!r}")
+            await self._evict(conn)
+
+    async def _keepalive(self, conn: Connection):
+        ping = json.dumps({"type": "ping"})
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            if time.monotonic() - conn.last_seen > PONG_TIMEOUT:
+                logger.info(f"Evicting half-open websocket in group {conn.group_id}: no pong")
+                await self._evict(conn)
+                return
+            conn.enqueue(ping)
+
+    async def _evict(self, conn: Connection, code: int = 1011):
+        self.disconnect(conn.websocket, conn.group_id)
+        try:
+            # Closing makes the endpoint's pending receive raise WebSocketDisconnect
+            await asyncio.wait_for(conn.websocket.close(code=code), SEND_TIMEOUT)
+        except Exception:
+            pass
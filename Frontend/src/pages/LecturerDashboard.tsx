@@ -187,7 +187,9 @@ export default function LecturerDashboard() {
 
     ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
-      if (data.type === "message") {
+      if (data.type === "ping") {
+        ws.send(JSON.stringify({ action: "pong" }));
+      } else if (data.type === "message") {
         setMessages((prev) => {
           if (prev.some((m) => m.id === data.doubt_id)) return prev;
           return [
@@ -113,7 +113,9 @@ useEffect(() => {
   ws.onmessage = (event) => {
     const data = JSON.parse(event.data);
 
-    if (data.type === "message") {
+    if (data.type === "ping") {
+      ws.send(JSON.stringify({ action: "pong" }));
+    } else if (data.type === "message") {
       setMessages((prev) => {
         const exists = prev.some((m) => m.id === data.doubt_id);
         if (exists) return prev; // 🧹 Prevent duplicates